@@ -1,6 +1,7 @@
 import httpx
 import os
 from typing import Dict, Any, List
+from decimal import Decimal
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -38,18 +39,22 @@ class InventoryTool:
         except Exception as e:
             return {"error": f"Erro ao obter estoque: {str(e)}"}
     
-    def calcular_custo_total(self) -> Dict[str, Any]:
-        """Calcula custo total do estoque"""
-        estoques = self.listar_estoque()
-        total = 0.0
-        
-        for estoque in estoques:
-            if estoque.get("custo_unitario") and estoque.get("quantidade_atual"):
-                total += float(estoque["custo_unitario"]) * float(estoque["quantidade_atual"])
+    def calcular_custo_total(self, data: str = None) -> Dict[str, Any]:
+        """Calcula custo total do estoque (no backend, em Decimal)"""
+        try:
+            params = {}
+            if data:
+                params["data"] = data
+            
+            response = httpx.get(f"{self.base_url}/valuation", params=params, timeout=10.0)
+            response.raise_for_status()
+            valor = response.json()
+        except Exception as e:
+            return {"error": f"Erro ao calcular custo do estoque: {str(e)}"}
         
         return {
-            "custo_total": total,
-            "itens": len(estoques),
+            "custo_total": Decimal(valor["total"]),
+            "itens": len(valor["ingredientes"]),
         }
     
     def processar_mensagem(self, mensagem: str, contexto: Dict[str, Any] = None) -> Dict[str, Any]:
@@ -16,88 +16,39 @@ class PlanningTool:
         self.pedidos_url = f"{BACKEND_API_URL}/api/pedidos"
         self.receitas_url = f"{BACKEND_API_URL}/api/receitas"
         self.estoque_url = f"{BACKEND_API_URL}/api/estoque"
+        self.planejamento_url = f"{BACKEND_API_URL}/api/planejamento"
     
     def gerar_lista_compras(
         self, data_inicio: str = None, data_fim: str = None
     ) -> Dict[str, Any]:
         """Gera lista de compras consolidada para um período"""
         try:
-            # Buscar pedidos do período
+            # Consolidação em unidade base feita pelo backend em uma única consulta
             params = {}
             if data_inicio:
                 params["data_inicio"] = data_inicio
             if data_fim:
                 params["data_fim"] = data_fim
             
-            response = httpx.get(self.pedidos_url, params=params, timeout=10.0)
+            response = httpx.get(
+                f"{self.planejamento_url}/lista-compras", params=params, timeout=10.0
+            )
             response.raise_for_status()
-            pedidos = response.json()
-            
-            # Consolidar ingredientes
-            ingredientes_necessarios = {}
-            
-            for pedido in pedidos:
-                if "itens" in pedido:
-                    for item in pedido["itens"]:
-                        receita_id = item.get("receita_id")
-                        quantidade_item = item.get("quantidade", 1)
-                        
-                        # Buscar receita
-                        rec_response = httpx.get(
-                            f"{self.receitas_url}/{receita_id}", timeout=10.0
-                        )
-                        if rec_response.status_code == 200:
-                            receita = rec_response.json()
-                            
-                            # Multiplicar ingredientes pela quantidade do item
-                            if "ingredientes" in receita:
-                                for ing in receita["ingredientes"]:
-                                    ing_id = ing.get("ingrediente_id")
-                                    qtd = float(ing.get("quantidade", 0)) * quantidade_item
-                                    unidade = ing.get("unidade", "g")
-                                    
-                                    key = f"{ing_id}_{unidade}"
-                                    if key not in ingredientes_necessarios:
-                                        ingredientes_necessarios[key] = {
-                                            "ingrediente_id": ing_id,
-                                            "quantidade": 0,
-                                            "unidade": unidade,
-                                            "ingrediente_nome": ing.get("ingrediente_nome"),
-                                        }
-                                    ingredientes_necessarios[key]["quantidade"] += qtd
-            
-            # Buscar estoque atual e calcular o que falta
-            estoque_response = httpx.get(self.estoque_url, timeout=10.0)
-            estoques = {}
-            if estoque_response.status_code == 200:
-                for estoque in estoque_response.json():
-                    estoques[estoque["ingrediente_id"]] = estoque
+            resultado = response.json()
             
-            lista_compras = []
-            for ing_data in ingredientes_necessarios.values():
-                ing_id = ing_data["ingrediente_id"]
-                qtd_necessaria = ing_data["quantidade"]
-                qtd_atual = 0
-                
-                if ing_id in estoques:
-                    qtd_atual = float(estoques[ing_id].get("quantidade_atual", 0))
-                
-                qtd_comprar = max(0, qtd_necessaria - qtd_atual)
-                
-                if qtd_comprar > 0:
-                    lista_compras.append({
-                        "ingrediente": ing_data["ingrediente_nome"],
-                        "quantidade_necessaria": qtd_necessaria,
-                        "quantidade_atual": qtd_atual,
-                        "quantidade_comprar": qtd_comprar,
-                        "unidade": ing_data["unidade"],
-                    })
+            lista_compras = [
+                {
+                    "ingrediente": item["ingrediente"],
+                    "quantidade_necessaria": float(item["quantidade_necessaria"]),
+                    "quantidade_atual": float(item["quantidade_atual"]),
+                    "quantidade_comprar": float(item["quantidade_comprar"]),
+                    "unidade": item["unidade"],
+                }
+                for item in resultado["lista_compras"]
+            ]
             
             return {
-                "periodo": {
-                    "inicio": data_inicio or str(date.today()),
-                    "fim": data_fim or str(date.today() + timedelta(days=7)),
-                },
+                "periodo": resultado["periodo"],
                 "lista_compras": lista_compras,
             }
             
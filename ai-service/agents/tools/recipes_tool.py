@@ -37,11 +37,18 @@ class RecipesTool:
             return {"error": f"Erro ao obter receita: {str(e)}"}
     
     def buscar_receita_por_nome(self, nome: str) -> Dict[str, Any]:
-        """Busca receita por nome (retorna primeira correspondência)"""
-        receitas = self.listar_receitas(nome=nome)
-        if receitas and len(receitas) > 0:
-            # Buscar receita completa
-            return self.obter_receita(receitas[0]["id"])
+        """Busca receita por nome (retorna a correspondência mais relevante)"""
+        try:
+            # A busca já devolve a receita completa
+            response = httpx.get(
+                f"{self.base_url}/busca", params={"q": nome, "limit": 1}, timeout=10.0
+            )
+            response.raise_for_status()
+            receitas = response.json()
+        except Exception as e:
+            return {"error": f"Erro ao buscar receita: {str(e)}"}
+        if receitas:
+            return receitas[0]
         return {"error": f"Receita '{nome}' não encontrada"}
     
     def processar_mensagem(self, mensagem: str, contexto: Dict[str, Any] = None) -> Dict[str, Any]:
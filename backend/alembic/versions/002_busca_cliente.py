@@ -0,0 +1,46 @@
+"""busca de clientes com pg_trgm
+
+Revision ID: 002_busca_cliente
+Revises: 001_initial
+Create Date: 2024-06-01 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002_busca_cliente'
+down_revision = '001_initial'
+branch_labels = None
+depends_on = None
+
+# Expressão congelada nesta revisão; mudar normalizar_sql em app.services.busca
+# exige uma nova migração que recrie a coluna
+CLIENTE_BUSCA = (
+    "translate(lower(cliente), "
+    "'áàâãäéèêëíìîïóòôõöúùûüçñÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑ', "
+    "'aaaaaeeeeiiiiooooouuuucnaaaaaeeeeiiiiooooouuuucn')"
+)
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # Nome do cliente normalizado (sem acentos, minúsculo), gerado pelo banco
+    op.add_column(
+        'pedidos',
+        sa.Column('cliente_busca', sa.String(), sa.Computed(CLIENTE_BUSCA, persisted=True), nullable=True)
+    )
+    op.create_index(
+        'ix_pedidos_cliente_busca_trgm',
+        'pedidos',
+        ['cliente_busca'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'cliente_busca': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pedidos_cliente_busca_trgm', table_name='pedidos')
+    op.drop_column('pedidos', 'cliente_busca')
@@ -0,0 +1,38 @@
+"""custo materializado das receitas
+
+Revision ID: 003_custo_receita
+Revises: 002_busca_cliente
+Create Date: 2024-06-15 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003_custo_receita'
+down_revision = '002_busca_cliente'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('receitas', sa.Column('custo', sa.Numeric(12, 4), nullable=True))
+
+    # Preencher o custo das receitas existentes
+    op.execute(
+        """
+        UPDATE receitas SET custo = (
+            SELECT CASE
+                WHEN COUNT(e.custo_unitario) = COUNT(*)
+                THEN COALESCE(SUM(ir.quantidade * e.custo_unitario), 0)
+            END
+            FROM ingrediente_receita ir
+            LEFT JOIN estoque e ON e.ingrediente_id = ir.ingrediente_id
+            WHERE ir.receita_id = receitas.id
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('receitas', 'custo')
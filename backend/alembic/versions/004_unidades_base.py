@@ -0,0 +1,110 @@
+"""quantidades em unidade base
+
+Revision ID: 004_unidades_base
+Revises: 003_custo_receita
+Create Date: 2024-06-22 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004_unidades_base'
+down_revision = '003_custo_receita'
+branch_labels = None
+depends_on = None
+
+# Expressões congeladas nesta revisão; mudar o registro de unidades em
+# app.services.unidades exige uma nova migração que recrie as colunas
+FATOR_BASE = (
+    "CASE lower(trim({coluna})) "
+    "WHEN 'mg' THEN 0.001 "
+    "WHEN 'g' THEN 1 "
+    "WHEN 'kg' THEN 1000 "
+    "WHEN 'ml' THEN 1 "
+    "WHEN 'l' THEN 1000 "
+    "WHEN 'un' THEN 1 "
+    "WHEN 'dz' THEN 12 "
+    "WHEN 'grama' THEN 1 "
+    "WHEN 'gramas' THEN 1 "
+    "WHEN 'quilo' THEN 1000 "
+    "WHEN 'kilo' THEN 1000 "
+    "WHEN 'litro' THEN 1000 "
+    "WHEN 'litros' THEN 1000 "
+    "WHEN 'lt' THEN 1000 "
+    "WHEN 'unidade' THEN 1 "
+    "WHEN 'unidades' THEN 1 "
+    "WHEN 'und' THEN 1 "
+    "WHEN 'duzia' THEN 12 "
+    "ELSE 1 END"
+)
+UNIDADE_BASE = (
+    "CASE lower(trim({coluna})) "
+    "WHEN 'mg' THEN 'g' "
+    "WHEN 'g' THEN 'g' "
+    "WHEN 'kg' THEN 'g' "
+    "WHEN 'ml' THEN 'ml' "
+    "WHEN 'l' THEN 'ml' "
+    "WHEN 'un' THEN 'un' "
+    "WHEN 'dz' THEN 'un' "
+    "WHEN 'grama' THEN 'g' "
+    "WHEN 'gramas' THEN 'g' "
+    "WHEN 'quilo' THEN 'g' "
+    "WHEN 'kilo' THEN 'g' "
+    "WHEN 'litro' THEN 'ml' "
+    "WHEN 'litros' THEN 'ml' "
+    "WHEN 'lt' THEN 'ml' "
+    "WHEN 'unidade' THEN 'un' "
+    "WHEN 'unidades' THEN 'un' "
+    "WHEN 'und' THEN 'un' "
+    "WHEN 'duzia' THEN 'un' "
+    "ELSE lower(trim({coluna})) END"
+)
+
+
+def _computed(expressao: str) -> sa.Computed:
+    return sa.Computed(expressao, persisted=True)
+
+
+def upgrade() -> None:
+    # Unidade base e fator da unidade padrão do ingrediente
+    op.add_column('ingredientes', sa.Column('unidade_base', sa.String(), _computed(UNIDADE_BASE.format(coluna='unidade_padrao')), nullable=True))
+    op.add_column('ingredientes', sa.Column('fator_base', sa.Numeric(14, 4), _computed(FATOR_BASE.format(coluna='unidade_padrao')), nullable=True))
+
+    # Quantidades das linhas de receita na unidade base
+    op.add_column('ingrediente_receita', sa.Column('quantidade_base', sa.Numeric(14, 4), _computed(f"quantidade * ({FATOR_BASE.format(coluna='unidade')})"), nullable=True))
+    op.add_column('ingrediente_receita', sa.Column('unidade_base', sa.String(), _computed(UNIDADE_BASE.format(coluna='unidade')), nullable=True))
+
+    # Índices das chaves estrangeiras usadas nas agregações por receita/pedido
+    op.create_index(op.f('ix_ingrediente_receita_receita_id'), 'ingrediente_receita', ['receita_id'], unique=False)
+    op.create_index(op.f('ix_itens_pedido_pedido_id'), 'itens_pedido', ['pedido_id'], unique=False)
+
+    # Recalcular o custo das receitas convertendo para a unidade padrão do ingrediente
+    op.execute(
+        """
+        UPDATE receitas SET custo = (
+            SELECT CASE
+                WHEN COUNT(l.custo) = COUNT(*) THEN COALESCE(SUM(l.custo), 0)
+            END
+            FROM (
+                SELECT CASE
+                    WHEN ir.unidade_base = i.unidade_base
+                    THEN ir.quantidade_base / i.fator_base * e.custo_unitario
+                END AS custo
+                FROM ingrediente_receita ir
+                JOIN ingredientes i ON i.id = ir.ingrediente_id
+                LEFT JOIN estoque e ON e.ingrediente_id = ir.ingrediente_id
+                WHERE ir.receita_id = receitas.id
+            ) l
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_itens_pedido_pedido_id'), table_name='itens_pedido')
+    op.drop_index(op.f('ix_ingrediente_receita_receita_id'), table_name='ingrediente_receita')
+    op.drop_column('ingrediente_receita', 'unidade_base')
+    op.drop_column('ingrediente_receita', 'quantidade_base')
+    op.drop_column('ingredientes', 'fator_base')
+    op.drop_column('ingredientes', 'unidade_base')
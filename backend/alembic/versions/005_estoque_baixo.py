@@ -0,0 +1,29 @@
+"""índice parcial de estoque baixo
+
+Revision ID: 005_estoque_baixo
+Revises: 004_unidades_base
+Create Date: 2024-06-29 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005_estoque_baixo'
+down_revision = '004_unidades_base'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_estoque_baixo',
+        'estoque',
+        ['ingrediente_id'],
+        unique=False,
+        postgresql_where=sa.text('quantidade_atual < ponto_reposicao'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_estoque_baixo', table_name='estoque')
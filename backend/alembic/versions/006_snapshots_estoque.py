@@ -0,0 +1,30 @@
+"""snapshots de estoque
+
+Revision ID: 006_snapshots_estoque
+Revises: 005_estoque_baixo
+Create Date: 2024-07-06 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006_snapshots_estoque'
+down_revision = '005_estoque_baixo'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'snapshots_estoque',
+        sa.Column('ingrediente_id', sa.Integer(), nullable=False),
+        sa.Column('data', sa.Date(), nullable=False),
+        sa.Column('quantidade', sa.Numeric(10, 2), nullable=False),
+        sa.ForeignKeyConstraint(['ingrediente_id'], ['ingredientes.id'], ),
+        sa.PrimaryKeyConstraint('ingrediente_id', 'data')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('snapshots_estoque')
@@ -0,0 +1,127 @@
+"""movimentacoes_estoque particionada por mês
+
+Revision ID: 007_particionar_movimentacoes
+Revises: 006_snapshots_estoque
+Create Date: 2024-07-13 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '007_particionar_movimentacoes'
+down_revision = '006_snapshots_estoque'
+branch_labels = None
+depends_on = None
+
+
+# Cria a partição de um mês, movendo para ela as linhas que estiverem na default
+CRIAR_PARTICAO = """
+CREATE OR REPLACE FUNCTION criar_particao_movimentacoes(mes date) RETURNS void
+LANGUAGE plpgsql AS $$
+DECLARE
+    inicio date := date_trunc('month', mes)::date;
+    fim date := (date_trunc('month', mes) + interval '1 month')::date;
+    nome text := format('movimentacoes_estoque_%s', to_char(mes, 'YYYY_MM'));
+BEGIN
+    IF to_regclass(nome) IS NOT NULL THEN
+        RETURN;
+    END IF;
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE movimentacoes_estoque INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+        nome
+    );
+    EXECUTE format(
+        'WITH movidas AS (DELETE FROM movimentacoes_estoque_default '
+        'WHERE data >= %L AND data < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM movidas',
+        inicio, fim, nome
+    );
+    EXECUTE format(
+        'ALTER TABLE movimentacoes_estoque ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        nome, inicio, fim
+    );
+END
+$$;
+"""
+
+# Partições do mês atual e dos próximos meses; chamada no startup da API
+CRIAR_PARTICOES = """
+CREATE OR REPLACE FUNCTION criar_particoes_movimentacoes(meses_a_frente integer DEFAULT 3)
+RETURNS void LANGUAGE plpgsql AS $$
+BEGIN
+    FOR i IN 0..meses_a_frente LOOP
+        PERFORM criar_particao_movimentacoes(
+            (date_trunc('month', current_date) + make_interval(months => i))::date
+        );
+    END LOOP;
+END
+$$;
+"""
+
+
+def upgrade() -> None:
+    op.execute('ALTER TABLE movimentacoes_estoque RENAME TO movimentacoes_estoque_antiga')
+    op.execute('ALTER INDEX movimentacoes_estoque_pkey RENAME TO movimentacoes_estoque_antiga_pkey')
+    op.drop_index('ix_movimentacoes_estoque_id', table_name='movimentacoes_estoque_antiga')
+    op.drop_index('ix_movimentacoes_estoque_ingrediente_id', table_name='movimentacoes_estoque_antiga')
+    op.drop_index('ix_movimentacoes_estoque_data', table_name='movimentacoes_estoque_antiga')
+
+    # A chave de partição (data) precisa fazer parte da chave primária; na
+    # frente, o índice da PK serve à paginação do histórico por (data, id)
+    op.execute(
+        """
+        CREATE TABLE movimentacoes_estoque (
+            id integer NOT NULL DEFAULT nextval('movimentacoes_estoque_id_seq'),
+            ingrediente_id integer NOT NULL REFERENCES ingredientes (id),
+            tipo tipomovimentacao NOT NULL,
+            quantidade numeric(10, 2) NOT NULL,
+            motivo varchar,
+            data date NOT NULL,
+            PRIMARY KEY (data, id)
+        ) PARTITION BY RANGE (data)
+        """
+    )
+    op.execute('ALTER SEQUENCE movimentacoes_estoque_id_seq OWNED BY movimentacoes_estoque.id')
+    op.execute('CREATE TABLE movimentacoes_estoque_default PARTITION OF movimentacoes_estoque DEFAULT')
+    op.execute('CREATE INDEX ix_movimentacoes_estoque_data_brin ON movimentacoes_estoque USING brin (data)')
+    op.execute('CREATE INDEX ix_movimentacoes_estoque_ingrediente_data ON movimentacoes_estoque (ingrediente_id, data)')
+
+    op.execute(CRIAR_PARTICAO)
+    op.execute(CRIAR_PARTICOES)
+
+    # Uma partição por mês já usado, mais os meses à frente; depois copia o histórico
+    op.execute(
+        """
+        SELECT criar_particao_movimentacoes(mes)
+        FROM (SELECT DISTINCT date_trunc('month', data)::date AS mes FROM movimentacoes_estoque_antiga) meses
+        """
+    )
+    op.execute('SELECT criar_particoes_movimentacoes(3)')
+    op.execute('INSERT INTO movimentacoes_estoque SELECT * FROM movimentacoes_estoque_antiga')
+    op.execute('DROP TABLE movimentacoes_estoque_antiga')
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE movimentacoes_estoque RENAME TO movimentacoes_estoque_particionada')
+    op.execute('ALTER INDEX movimentacoes_estoque_pkey RENAME TO movimentacoes_estoque_particionada_pkey')
+    op.execute('ALTER SEQUENCE movimentacoes_estoque_id_seq OWNED BY NONE')
+    op.execute(
+        """
+        CREATE TABLE movimentacoes_estoque (
+            id integer NOT NULL DEFAULT nextval('movimentacoes_estoque_id_seq') PRIMARY KEY,
+            ingrediente_id integer NOT NULL REFERENCES ingredientes (id),
+            tipo tipomovimentacao NOT NULL,
+            quantidade numeric(10, 2) NOT NULL,
+            motivo varchar,
+            data date NOT NULL
+        )
+        """
+    )
+    op.execute('ALTER SEQUENCE movimentacoes_estoque_id_seq OWNED BY movimentacoes_estoque.id')
+    op.execute('INSERT INTO movimentacoes_estoque SELECT * FROM movimentacoes_estoque_particionada')
+    op.execute('DROP TABLE movimentacoes_estoque_particionada')
+    op.execute('DROP FUNCTION criar_particoes_movimentacoes(integer)')
+    op.execute('DROP FUNCTION criar_particao_movimentacoes(date)')
+    op.create_index('ix_movimentacoes_estoque_id', 'movimentacoes_estoque', ['id'], unique=False)
+    op.create_index('ix_movimentacoes_estoque_ingrediente_id', 'movimentacoes_estoque', ['ingrediente_id'], unique=False)
+    op.create_index('ix_movimentacoes_estoque_data', 'movimentacoes_estoque', ['data'], unique=False)
@@ -0,0 +1,50 @@
+"""baixa de estoque na entrada em produção
+
+Revision ID: 008_baixa_estoque_producao
+Revises: 007_particionar_movimentacoes
+Create Date: 2024-07-20 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008_baixa_estoque_producao'
+down_revision = '007_particionar_movimentacoes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'pedidos',
+        sa.Column('estoque_baixado', sa.Boolean(), server_default=sa.false(), nullable=False)
+    )
+    # Pedidos já em produção ou adiante tiveram a baixa lançada à mão
+    op.execute(
+        "UPDATE pedidos SET estoque_baixado = true "
+        "WHERE status IN ('EM_PRODUCAO', 'PRONTO', 'ENTREGUE')"
+    )
+
+    op.add_column('movimentacoes_estoque', sa.Column('pedido_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'movimentacoes_estoque_pedido_id_fkey',
+        'movimentacoes_estoque',
+        'pedidos',
+        ['pedido_id'],
+        ['id'],
+    )
+    op.create_index(
+        'ix_movimentacoes_estoque_pedido_id',
+        'movimentacoes_estoque',
+        ['pedido_id'],
+        unique=False,
+        postgresql_where=sa.text('pedido_id IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_movimentacoes_estoque_pedido_id', table_name='movimentacoes_estoque')
+    op.drop_constraint('movimentacoes_estoque_pedido_id_fkey', 'movimentacoes_estoque', type_='foreignkey')
+    op.drop_column('movimentacoes_estoque', 'pedido_id')
+    op.drop_column('pedidos', 'estoque_baixado')
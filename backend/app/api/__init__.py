@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api import pedidos, receitas, estoque, agenda, stats, chat, import_api
+from app.api import pedidos, receitas, estoque, agenda, stats, chat, import_api, metrics, planejamento
 
 api_router = APIRouter()
 
@@ -10,4 +10,6 @@ api_router.include_router(agenda.router)
 api_router.include_router(stats.router)
 api_router.include_router(chat.router)
 api_router.include_router(import_api.router)
+api_router.include_router(metrics.router)
+api_router.include_router(planejamento.router)
 
@@ -1,26 +1,75 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.orm import Session, joinedload
+from typing import Dict, List, Optional
 from datetime import datetime, date
-from app.db.database import get_db
+from app.db.database import get_db, db_endpoint
 from app.models.agenda import AgendaEntrega
 from app.models.pedido import Pedido
+from app.services.receita_cache import catalogo_receitas
 from app.schemas.agenda import (
     AgendaEntregaCreate,
     AgendaEntregaUpdate,
     AgendaEntregaResponse,
+    PedidoResumoResponse,
 )
+from app.schemas.pedido import ItemPedidoResponse
 
 router = APIRouter(prefix="/api/agenda", tags=["agenda"])
 
 
+def _agenda_response(
+    agenda: AgendaEntrega,
+    pedido: Optional[Pedido],
+    nomes: Optional[Dict[int, str]] = None,
+) -> AgendaEntregaResponse:
+    """Monta a entrega com o resumo do pedido; itens só quando os nomes são informados"""
+    resumo = None
+    if pedido:
+        resumo = PedidoResumoResponse(
+            id=pedido.id,
+            cliente=pedido.cliente,
+            status=pedido.status,
+            data_entrega=pedido.data_entrega,
+            horario=pedido.horario,
+            preco_total=pedido.preco_total,
+            itens=[
+                ItemPedidoResponse(
+                    id=item.id,
+                    receita_id=item.receita_id,
+                    quantidade=item.quantidade,
+                    unidade=item.unidade,
+                    personalizacoes=item.personalizacoes,
+                    receita_nome=nomes.get(item.receita_id),
+                )
+                for item in pedido.itens
+            ]
+            if nomes is not None
+            else None,
+        )
+    return AgendaEntregaResponse(
+        id=agenda.id,
+        pedido_id=agenda.pedido_id,
+        data_hora=agenda.data_hora,
+        local=agenda.local,
+        responsavel=agenda.responsavel,
+        pedido_cliente=pedido.cliente if pedido else None,
+        pedido=resumo,
+    )
+
+
 @router.get("", response_model=List[AgendaEntregaResponse])
+@db_endpoint
 def listar_agenda(
     data_inicio: Optional[date] = Query(None),
     data_fim: Optional[date] = Query(None),
+    incluir_itens: bool = Query(False),
     db: Session = Depends(get_db),
 ):
-    query = db.query(AgendaEntrega)
+    # Pedido no mesmo SELECT (join); itens, se pedidos, em uma consulta extra (selectin)
+    carregar_pedido = joinedload(AgendaEntrega.pedido)
+    if incluir_itens:
+        carregar_pedido = carregar_pedido.selectinload(Pedido.itens)
+    query = db.query(AgendaEntrega).options(carregar_pedido)
     
     if data_inicio:
         query = query.filter(AgendaEntrega.data_hora >= datetime.combine(data_inicio, datetime.min.time()))
@@ -29,23 +78,24 @@ def listar_agenda(
     
     entregas = query.order_by(AgendaEntrega.data_hora.asc()).all()
     
-    result = []
-    for entrega in entregas:
-        pedido = db.query(Pedido).filter(Pedido.id == entrega.pedido_id).first()
-        result.append(
-            AgendaEntregaResponse(
-                id=entrega.id,
-                pedido_id=entrega.pedido_id,
-                data_hora=entrega.data_hora,
-                local=entrega.local,
-                responsavel=entrega.responsavel,
-                pedido_cliente=pedido.cliente if pedido else None,
-            )
+    nomes = None
+    if incluir_itens:
+        # Nomes das receitas vêm do cache do catálogo
+        nomes = catalogo_receitas.nomes(
+            db,
+            {
+                item.receita_id
+                for entrega in entregas
+                if entrega.pedido
+                for item in entrega.pedido.itens
+            },
         )
-    return result
+    
+    return [_agenda_response(entrega, entrega.pedido, nomes) for entrega in entregas]
 
 
 @router.post("", response_model=AgendaEntregaResponse, status_code=201)
+@db_endpoint
 def criar_agenda(agenda_data: AgendaEntregaCreate, db: Session = Depends(get_db)):
     # Verificar se pedido existe
     pedido = db.query(Pedido).filter(Pedido.id == agenda_data.pedido_id).first()
@@ -73,17 +123,11 @@ def criar_agenda(agenda_data: AgendaEntregaCreate, db: Session = Depends(get_db)
     db.commit()
     db.refresh(agenda)
     
-    return AgendaEntregaResponse(
-        id=agenda.id,
-        pedido_id=agenda.pedido_id,
-        data_hora=agenda.data_hora,
-        local=agenda.local,
-        responsavel=agenda.responsavel,
-        pedido_cliente=pedido.cliente,
-    )
+    return _agenda_response(agenda, pedido)
 
 
 @router.patch("/{agenda_id}", response_model=AgendaEntregaResponse)
+@db_endpoint
 def atualizar_agenda(
     agenda_id: int, agenda_data: AgendaEntregaUpdate, db: Session = Depends(get_db)
 ):
@@ -98,14 +142,5 @@ def atualizar_agenda(
     db.commit()
     db.refresh(agenda)
     
-    pedido = db.query(Pedido).filter(Pedido.id == agenda.pedido_id).first()
-    
-    return AgendaEntregaResponse(
-        id=agenda.id,
-        pedido_id=agenda.pedido_id,
-        data_hora=agenda.data_hora,
-        local=agenda.local,
-        responsavel=agenda.responsavel,
-        pedido_cliente=pedido.cliente if pedido else None,
-    )
+    return _agenda_response(agenda, agenda.pedido)
 
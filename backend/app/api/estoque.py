@@ -1,81 +1,232 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, insert, select
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import date
+from typing import Any, Iterator, List, Optional
+from datetime import date, timedelta
 from decimal import Decimal
-from app.db.database import get_db
-from app.models.estoque import Estoque, MovimentacaoEstoque, TipoMovimentacao
+from app.db.database import get_db, db_endpoint
+from app.models.estoque import Estoque, MovimentacaoEstoque, TipoMovimentacao, ESTOQUE_BAIXO
 from app.models.ingrediente import Ingrediente
+from app.services.versoes import versoes, condicional, ESTOQUE
+from app.services.movimentacoes import aplicar_movimentacao, aplicar_movimentacoes
+from app.services.snapshots import posicao_em, gerar_snapshots, invalidar_snapshots
+from app.services.pagination import cortar_pagina, executar_em_streaming, ordenar_por_cursor
 from app.schemas.estoque import (
     EstoqueResponse,
     MovimentacaoEstoqueCreate,
     MovimentacaoEstoqueResponse,
+    MovimentacaoEstoqueLoteResponse,
+    PosicaoEstoqueResponse,
+    SnapshotEstoqueResponse,
+    ValorEstoqueItemResponse,
+    ValorEstoqueResponse,
 )
 
 router = APIRouter(prefix="/api/estoque", tags=["estoque"])
 
+def _estoque_response(
+    estoque: Estoque, nome: Optional[str], unidade: Optional[str]
+) -> EstoqueResponse:
+    return EstoqueResponse(
+        ingrediente_id=estoque.ingrediente_id,
+        ingrediente_nome=nome,
+        quantidade_atual=estoque.quantidade_atual,
+        custo_unitario=estoque.custo_unitario,
+        ponto_reposicao=estoque.ponto_reposicao or Decimal("0"),
+        unidade_padrao=unidade,
+    )
+
 
-@router.get("", response_model=List[EstoqueResponse])
+def _query_estoque(db: Session):
+    """Estoque com nome e unidade do ingrediente na mesma consulta"""
+    return db.query(Estoque, Ingrediente.nome, Ingrediente.unidade_padrao).outerjoin(
+        Ingrediente, Ingrediente.id == Estoque.ingrediente_id
+    )
+
+
+@router.get(
+    "",
+    response_model=List[EstoqueResponse],
+    dependencies=[Depends(condicional(ESTOQUE))],
+)
+@db_endpoint
 def listar_estoque(
     ingrediente_id: Optional[int] = Query(None),
     baixo_estoque: Optional[bool] = Query(None),
     db: Session = Depends(get_db),
 ):
-    query = db.query(Estoque)
+    query = _query_estoque(db)
     
     if ingrediente_id:
         query = query.filter(Estoque.ingrediente_id == ingrediente_id)
+    if baixo_estoque:
+        query = query.filter(ESTOQUE_BAIXO)
     
-    estoques = query.all()
+    return [
+        _estoque_response(estoque, nome, unidade)
+        for estoque, nome, unidade in query.order_by(Estoque.ingrediente_id).all()
+    ]
+
+
+@router.get(
+    "/posicao",
+    response_model=List[PosicaoEstoqueResponse],
+    dependencies=[Depends(condicional(ESTOQUE))],
+)
+@db_endpoint
+def obter_posicao(
+    data: date = Query(...),
+    ingrediente_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db),
+):
+    """Saldo ao fim da data: snapshot mais recente + movimentações desde ele (ver posicao_em)"""
+    query = db.query(Ingrediente.id, Ingrediente.nome, Ingrediente.unidade_padrao)
+    if ingrediente_id:
+        query = query.filter(Ingrediente.id == ingrediente_id)
+    ingredientes = query.order_by(Ingrediente.id).all()
+    
+    posicoes = posicao_em(db, data, [ingrediente_id] if ingrediente_id else None)
     
     result = []
-    for estoque in estoques:
-        ingrediente = (
-            db.query(Ingrediente)
-            .filter(Ingrediente.id == estoque.ingrediente_id)
-            .first()
-        )
-        
-        # Filtrar baixo estoque se solicitado
-        if baixo_estoque and estoque.quantidade_atual >= estoque.ponto_reposicao:
-            continue
-        
+    for ing_id, nome, unidade in ingredientes:
+        quantidade, snapshot_data = posicoes.get(ing_id, (Decimal("0"), None))
         result.append(
-            EstoqueResponse(
-                ingrediente_id=estoque.ingrediente_id,
-                ingrediente_nome=ingrediente.nome if ingrediente else None,
-                quantidade_atual=estoque.quantidade_atual,
-                custo_unitario=estoque.custo_unitario,
-                ponto_reposicao=estoque.ponto_reposicao or Decimal("0"),
-                unidade_padrao=ingrediente.unidade_padrao if ingrediente else None,
+            PosicaoEstoqueResponse(
+                ingrediente_id=ing_id,
+                ingrediente_nome=nome,
+                unidade_padrao=unidade,
+                data=data,
+                quantidade=quantidade,
+                snapshot_data=snapshot_data,
             )
         )
     return result
 
 
-@router.get("/{ingrediente_id}", response_model=EstoqueResponse)
-def obter_estoque(ingrediente_id: int, db: Session = Depends(get_db)):
-    estoque = (
-        db.query(Estoque).filter(Estoque.ingrediente_id == ingrediente_id).first()
-    )
-    if not estoque:
-        raise HTTPException(status_code=404, detail="Estoque não encontrado")
+@router.get(
+    "/valuation",
+    response_model=ValorEstoqueResponse,
+    dependencies=[Depends(condicional(ESTOQUE))],
+)
+@db_endpoint
+def obter_valor_estoque(
+    data: Optional[date] = Query(None, description="Posição ao fim da data; padrão: atual"),
+    db: Session = Depends(get_db),
+):
+    """Valor do estoque (quantidade x custo unitário) em Decimal, total e por ingrediente"""
+    if data is None:
+        # Valor por ingrediente e total (janela) na mesma consulta
+        valor = Estoque.quantidade_atual * Estoque.custo_unitario
+        rows = db.execute(
+            select(
+                Estoque.ingrediente_id,
+                Ingrediente.nome,
+                Estoque.quantidade_atual.label("quantidade"),
+                Estoque.custo_unitario,
+                valor.label("valor"),
+                func.sum(valor).over().label("total"),
+            )
+            .outerjoin(Ingrediente, Ingrediente.id == Estoque.ingrediente_id)
+            .order_by(Estoque.ingrediente_id)
+        ).all()
+        itens = [
+            ValorEstoqueItemResponse(
+                ingrediente_id=row.ingrediente_id,
+                ingrediente_nome=row.nome,
+                quantidade=row.quantidade,
+                custo_unitario=row.custo_unitario,
+                valor=row.valor,
+            )
+            for row in rows
+        ]
+        total = (rows[0].total if rows else None) or Decimal("0")
+    else:
+        # Quantidade histórica (snapshot + movimentações) ao custo unitário atual
+        posicoes = posicao_em(db, data)
+        custos = dict(
+            db.query(Estoque.ingrediente_id, Estoque.custo_unitario).filter(
+                Estoque.ingrediente_id.in_(posicoes)
+            )
+        )
+        nomes = dict(
+            db.query(Ingrediente.id, Ingrediente.nome).filter(Ingrediente.id.in_(posicoes))
+        )
+        itens = []
+        for ing_id in sorted(posicoes):
+            quantidade = posicoes[ing_id][0]
+            custo = custos.get(ing_id)
+            itens.append(
+                ValorEstoqueItemResponse(
+                    ingrediente_id=ing_id,
+                    ingrediente_nome=nomes.get(ing_id),
+                    quantidade=quantidade,
+                    custo_unitario=custo,
+                    valor=quantidade * custo if custo is not None else None,
+                )
+            )
+        total = sum((item.valor for item in itens if item.valor is not None), Decimal("0"))
     
-    ingrediente = (
-        db.query(Ingrediente).filter(Ingrediente.id == ingrediente_id).first()
+    return ValorEstoqueResponse(
+        data=data,
+        total=total,
+        sem_custo=sum(1 for item in itens if item.valor is None and item.quantidade),
+        ingredientes=itens,
     )
+
+
+@router.post("/snapshots", response_model=SnapshotEstoqueResponse, status_code=201)
+@db_endpoint
+def gerar_snapshot(
+    data: Optional[date] = Query(None, description="Dia encerrado; padrão: ontem"),
+    db: Session = Depends(get_db),
+):
+    """Grava o saldo de todos os ingredientes ao fim do dia
+
+    A API já grava o snapshot do dia anterior periodicamente
+    (ESTOQUE_SNAPSHOTS_INTERVALO_HORAS). Este endpoint serve para fechamentos
+    avulsos, para regravar um dia ou para um cron externo quando a tarefa
+    interna estiver desativada (intervalo 0).
+    """
+    data = data or date.today() - timedelta(days=1)
+    if data >= date.today():
+        raise HTTPException(
+            status_code=400, detail="Snapshots só podem ser gerados para dias encerrados"
+        )
     
-    return EstoqueResponse(
-        ingrediente_id=estoque.ingrediente_id,
-        ingrediente_nome=ingrediente.nome if ingrediente else None,
-        quantidade_atual=estoque.quantidade_atual,
-        custo_unitario=estoque.custo_unitario,
-        ponto_reposicao=estoque.ponto_reposicao or Decimal("0"),
-        unidade_padrao=ingrediente.unidade_padrao if ingrediente else None,
-    )
+    ingredientes = gerar_snapshots(db, data)
+    db.commit()
+    
+    return SnapshotEstoqueResponse(data=data, ingredientes=ingredientes)
+
+
+@router.get(
+    "/{ingrediente_id}",
+    response_model=EstoqueResponse,
+    dependencies=[Depends(condicional(ESTOQUE))],
+)
+@db_endpoint
+def obter_estoque(ingrediente_id: int, db: Session = Depends(get_db)):
+    row = _query_estoque(db).filter(Estoque.ingrediente_id == ingrediente_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Estoque não encontrado")
+    
+    return _estoque_response(*row)
+
+
+def _validar_data(movimentacao_data: MovimentacaoEstoqueCreate) -> None:
+    # Um ajuste define o saldo atual; com data passada ele reescreveria o
+    # histórico reaplicado em /posicao, que passaria a divergir do saldo
+    if (
+        movimentacao_data.tipo == TipoMovimentacao.AJUSTE
+        and movimentacao_data.data
+        and movimentacao_data.data < date.today()
+    ):
+        raise HTTPException(status_code=400, detail="Ajustes não podem ser retroativos")
 
 
 @router.post("/movimentacao", response_model=MovimentacaoEstoqueResponse, status_code=201)
+@db_endpoint
 def registrar_movimentacao(
     movimentacao_data: MovimentacaoEstoqueCreate, db: Session = Depends(get_db)
 ):
@@ -88,89 +239,193 @@ def registrar_movimentacao(
     if not ingrediente:
         raise HTTPException(status_code=404, detail="Ingrediente não encontrado")
     
-    # Criar ou atualizar estoque
-    estoque = (
-        db.query(Estoque)
-        .filter(Estoque.ingrediente_id == movimentacao_data.ingrediente_id)
-        .first()
+    _validar_data(movimentacao_data)
+    
+    # Saldo atualizado no próprio UPDATE (sem ler e regravar em Python)
+    saldo = aplicar_movimentacao(
+        db,
+        movimentacao_data.ingrediente_id,
+        movimentacao_data.tipo,
+        movimentacao_data.quantidade,
     )
     
-    if not estoque:
-        estoque = Estoque(
+    # Criar movimentação
+    data_movimentacao = movimentacao_data.data or date.today()
+    invalidar_snapshots(db, [(movimentacao_data.ingrediente_id, data_movimentacao)])
+    movimentacao_id = db.execute(
+        insert(MovimentacaoEstoque)
+        .values(
             ingrediente_id=movimentacao_data.ingrediente_id,
-            quantidade_atual=Decimal("0"),
+            tipo=movimentacao_data.tipo,
+            quantidade=movimentacao_data.quantidade,
+            motivo=movimentacao_data.motivo,
+            data=data_movimentacao,
         )
-        db.add(estoque)
-    
-    # Atualizar quantidade
-    if movimentacao_data.tipo == TipoMovimentacao.ENTRADA:
-        estoque.quantidade_atual += movimentacao_data.quantidade
-    elif movimentacao_data.tipo == TipoMovimentacao.SAIDA:
-        estoque.quantidade_atual -= movimentacao_data.quantidade
-        if estoque.quantidade_atual < 0:
-            estoque.quantidade_atual = Decimal("0")
-    else:  # AJUSTE
-        estoque.quantidade_atual = movimentacao_data.quantidade
+        .returning(MovimentacaoEstoque.id)
+    ).scalar_one()
     
-    # Criar movimentação
-    movimentacao = MovimentacaoEstoque(
+    db.commit()
+    versoes.incrementar(ESTOQUE)
+    
+    return MovimentacaoEstoqueResponse(
+        id=movimentacao_id,
         ingrediente_id=movimentacao_data.ingrediente_id,
+        ingrediente_nome=ingrediente.nome,
         tipo=movimentacao_data.tipo,
         quantidade=movimentacao_data.quantidade,
         motivo=movimentacao_data.motivo,
-        data=movimentacao_data.data or date.today(),
+        data=data_movimentacao,
+        saldo_atual=saldo,
     )
-    db.add(movimentacao)
+
+
+@router.post(
+    "/movimentacoes/bulk", response_model=MovimentacaoEstoqueLoteResponse, status_code=201
+)
+@db_endpoint
+def registrar_movimentacoes_em_lote(
+    movimentacoes_data: List[MovimentacaoEstoqueCreate], db: Session = Depends(get_db)
+):
+    """Registra várias movimentações (ex: recebimento de entrega) em uma única transação"""
+    if not movimentacoes_data:
+        raise HTTPException(status_code=400, detail="Nenhuma movimentação informada")
+    
+    # Valida todos os ingredientes em uma consulta
+    ingrediente_ids = {mov.ingrediente_id for mov in movimentacoes_data}
+    nomes = dict(
+        db.query(Ingrediente.id, Ingrediente.nome)
+        .filter(Ingrediente.id.in_(ingrediente_ids))
+        .all()
+    )
+    faltando = sorted(ingrediente_ids - nomes.keys())
+    if faltando:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Ingrediente(s) não encontrado(s): {', '.join(map(str, faltando))}",
+        )
+    for mov in movimentacoes_data:
+        _validar_data(mov)
+    
+    # Deltas compostos por ingrediente, aplicados em um único UPDATE
+    saldos = aplicar_movimentacoes(
+        db, [(mov.ingrediente_id, mov.tipo, mov.quantidade) for mov in movimentacoes_data]
+    )
+    
+    hoje = date.today()
+    rows = [
+        {
+            "ingrediente_id": mov.ingrediente_id,
+            "tipo": mov.tipo,
+            "quantidade": mov.quantidade,
+            "motivo": mov.motivo,
+            "data": mov.data or hoje,
+        }
+        for mov in movimentacoes_data
+    ]
+    invalidar_snapshots(db, [(row["ingrediente_id"], row["data"]) for row in rows])
+    movimentacao_ids = db.scalars(
+        insert(MovimentacaoEstoque).returning(
+            MovimentacaoEstoque.id, sort_by_parameter_order=True
+        ),
+        rows,
+    ).all()
     
     db.commit()
-    db.refresh(movimentacao)
+    versoes.incrementar(ESTOQUE)
     
+    return MovimentacaoEstoqueLoteResponse(
+        registradas=len(rows),
+        movimentacoes=[
+            MovimentacaoEstoqueResponse(
+                id=movimentacao_id,
+                ingrediente_nome=nomes[row["ingrediente_id"]],
+                **row,
+            )
+            for movimentacao_id, row in zip(movimentacao_ids, rows)
+        ],
+        saldos=saldos,
+    )
+
+
+def _query_movimentacoes(
+    ingrediente_id: Optional[int],
+    data_inicio: Optional[date],
+    data_fim: Optional[date],
+):
+    """Movimentações filtradas, com o nome do ingrediente na mesma consulta"""
+    stmt = select(MovimentacaoEstoque, Ingrediente.nome).outerjoin(
+        Ingrediente, Ingrediente.id == MovimentacaoEstoque.ingrediente_id
+    )
+    if ingrediente_id:
+        stmt = stmt.where(MovimentacaoEstoque.ingrediente_id == ingrediente_id)
+    if data_inicio:
+        stmt = stmt.where(MovimentacaoEstoque.data >= data_inicio)
+    if data_fim:
+        stmt = stmt.where(MovimentacaoEstoque.data <= data_fim)
+    return stmt
+
+
+def _movimentacao_response(
+    mov: MovimentacaoEstoque, ingrediente_nome: Optional[str]
+) -> MovimentacaoEstoqueResponse:
     return MovimentacaoEstoqueResponse(
-        id=movimentacao.id,
-        ingrediente_id=movimentacao.ingrediente_id,
-        ingrediente_nome=ingrediente.nome,
-        tipo=movimentacao.tipo,
-        quantidade=movimentacao.quantidade,
-        motivo=movimentacao.motivo,
-        data=movimentacao.data,
+        id=mov.id,
+        ingrediente_id=mov.ingrediente_id,
+        ingrediente_nome=ingrediente_nome,
+        tipo=mov.tipo,
+        quantidade=mov.quantidade,
+        motivo=mov.motivo,
+        data=mov.data,
     )
 
 
-@router.get("/movimentacoes/historico", response_model=List[MovimentacaoEstoqueResponse])
+@router.get(
+    "/movimentacoes/historico",
+    response_model=List[MovimentacaoEstoqueResponse],
+    dependencies=[Depends(condicional(ESTOQUE))],
+)
+@db_endpoint
 def listar_movimentacoes(
+    response: Response,
     ingrediente_id: Optional[int] = Query(None),
     data_inicio: Optional[date] = Query(None),
     data_fim: Optional[date] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
     db: Session = Depends(get_db),
 ):
-    query = db.query(MovimentacaoEstoque)
-    
-    if ingrediente_id:
-        query = query.filter(MovimentacaoEstoque.ingrediente_id == ingrediente_id)
-    if data_inicio:
-        query = query.filter(MovimentacaoEstoque.data >= data_inicio)
-    if data_fim:
-        query = query.filter(MovimentacaoEstoque.data <= data_fim)
+    stmt = _query_movimentacoes(ingrediente_id, data_inicio, data_fim)
     
-    movimentacoes = query.order_by(MovimentacaoEstoque.data.desc()).all()
+    # Paginação keyset em (data, id), na mesma ordem da PK das partições
+    stmt = ordenar_por_cursor(stmt, cursor, MovimentacaoEstoque.data, MovimentacaoEstoque.id)
+    rows = cortar_pagina(
+        db.execute(stmt.limit(limit + 1)).all(),
+        limit,
+        response,
+        lambda row: (row[0].data, row[0].id),
+    )
     
-    result = []
-    for mov in movimentacoes:
-        ingrediente = (
-            db.query(Ingrediente)
-            .filter(Ingrediente.id == mov.ingrediente_id)
-            .first()
-        )
-        result.append(
-            MovimentacaoEstoqueResponse(
-                id=mov.id,
-                ingrediente_id=mov.ingrediente_id,
-                ingrediente_nome=ingrediente.nome if ingrediente else None,
-                tipo=mov.tipo,
-                quantidade=mov.quantidade,
-                motivo=mov.motivo,
-                data=mov.data,
-            )
-        )
-    return result
+    return [_movimentacao_response(mov, nome) for mov, nome in rows]
+
+
+def _export_ndjson(linhas: Iterator[Any]) -> Iterator[str]:
+    for mov, nome in linhas:
+        yield _movimentacao_response(mov, nome).model_dump_json() + "\n"
+
 
+@router.get("/movimentacoes/export")
+def exportar_movimentacoes(
+    ingrediente_id: Optional[int] = Query(None),
+    data_inicio: Optional[date] = Query(None),
+    data_fim: Optional[date] = Query(None),
+):
+    """Exporta o histórico completo em streaming (NDJSON, ordem cronológica)"""
+    nome_arquivo = f"movimentacoes_{data_inicio or 'inicio'}_{data_fim or 'fim'}.ndjson"
+    stmt = _query_movimentacoes(ingrediente_id, data_inicio, data_fim).order_by(
+        MovimentacaoEstoque.data, MovimentacaoEstoque.id
+    )
+    return StreamingResponse(
+        _export_ndjson(executar_em_streaming(stmt)),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}"'},
+    )
@@ -7,6 +7,9 @@ from decimal import Decimal
 from app.db.database import get_db
 from app.models.ingrediente import Ingrediente
 from app.models.estoque import Estoque
+from app.services.versoes import versoes, ESTOQUE, RECEITAS
+from app.services.receita_cache import catalogo_receitas
+from app.services.custos import recalcular_custos_por_ingredientes
 
 router = APIRouter(prefix="/api/import", tags=["import"])
 
@@ -29,6 +32,7 @@ async def importar_custos(
         
         linhas_processadas = 0
         erros = []
+        ingredientes_alterados = set()
         
         for linha_num, row in enumerate(csv_reader, start=2):  # Começa em 2 (linha 1 é header)
             try:
@@ -82,12 +86,19 @@ async def importar_custos(
                     )
                     db.add(estoque)
                 
+                ingredientes_alterados.add(ingrediente.id)
                 linhas_processadas += 1
                 
             except Exception as e:
                 erros.append(f"Linha {linha_num}: Erro ao processar - {str(e)}")
         
+        # Custos das receitas afetadas, na mesma transação
+        db.flush()
+        recalcular_custos_por_ingredientes(db, ingredientes_alterados)
+        
         db.commit()
+        catalogo_receitas.invalidar()
+        versoes.incrementar(ESTOQUE, RECEITAS)
         
         return {
             "message": "Importação concluída",
@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from app.db import database
+from app.db.metrics import snapshot_pool
+from app.schemas.metrics import MetricasDbResponse, MetricasPoolResponse
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/db", response_model=MetricasDbResponse)
+def obter_metricas_db():
+    assincrono = None
+    if database.async_engine is not None:
+        assincrono = MetricasPoolResponse(**snapshot_pool(database.async_engine.pool))
+    
+    return MetricasDbResponse(
+        sincrono=MetricasPoolResponse(**snapshot_pool(database.engine.pool)),
+        assincrono=assincrono,
+    )
@@ -1,31 +1,97 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, func, insert, or_, select, update
+from sqlalchemy.orm import Session, selectinload
+from typing import Any, Dict, Iterator, List, Literal, Optional
 from datetime import date
-from app.db.database import get_db
-from app.models.pedido import Pedido, ItemPedido, StatusPedido
-from app.models.receita import Receita
+from itertools import groupby
+from app.db.database import get_db, db_endpoint
+from app.models.pedido import Pedido, ItemPedido, StatusPedido, TRANSICOES_STATUS
 from app.schemas.pedido import (
     PedidoCreate,
     PedidoUpdate,
     PedidoResponse,
     PedidoStatusUpdate,
+    PedidoStatusLoteUpdate,
+    PedidoStatusLoteResponse,
+    BaixaPendenteResponse,
+    PedidoBulkResultado,
+    PedidoBulkResponse,
+    ClienteBuscaResponse,
     ItemPedidoResponse,
 )
+from app.services.pagination import (
+    cortar_pagina,
+    csv_em_blocos,
+    executar_em_streaming,
+    ordenar_por_cursor,
+)
+from app.services.parametros import decode_ids
+from app.services.receita_cache import catalogo_receitas
+from app.services.busca import normalizar
+from app.services.versoes import versoes, condicional, PEDIDOS, RECEITAS, ESTOQUE
+from app.services.producao import sincronizar_estoque_pedidos, STATUS_COM_ESTOQUE
 
 router = APIRouter(prefix="/api/pedidos", tags=["pedidos"])
 
 
-@router.get("", response_model=List[PedidoResponse])
+def _pedido_response(pedido: Pedido, nomes: Dict[int, str]) -> PedidoResponse:
+    """Monta a resposta de um pedido a partir dos dados já carregados"""
+    return PedidoResponse(
+        id=pedido.id,
+        cliente=pedido.cliente,
+        status=pedido.status,
+        data_entrega=pedido.data_entrega,
+        horario=pedido.horario,
+        local=pedido.local,
+        observacoes=pedido.observacoes,
+        preco_total=pedido.preco_total,
+        itens=[
+            ItemPedidoResponse(
+                id=item.id,
+                receita_id=item.receita_id,
+                quantidade=item.quantidade,
+                unidade=item.unidade,
+                personalizacoes=item.personalizacoes,
+                receita_nome=nomes.get(item.receita_id),
+            )
+            for item in pedido.itens
+        ],
+    )
+
+
+def _pedidos_response(db: Session, pedidos: List[Pedido]) -> List[PedidoResponse]:
+    nomes = catalogo_receitas.nomes(
+        db, {item.receita_id for pedido in pedidos for item in pedido.itens}
+    )
+    return [_pedido_response(pedido, nomes) for pedido in pedidos]
+
+
+@router.get(
+    "",
+    response_model=List[PedidoResponse],
+    dependencies=[Depends(condicional(PEDIDOS, RECEITAS))],
+)
+@db_endpoint
 def listar_pedidos(
+    response: Response,
     data_inicio: Optional[date] = Query(None),
     data_fim: Optional[date] = Query(None),
     status: Optional[StatusPedido] = Query(None),
     cliente: Optional[str] = Query(None),
+    ids: Optional[str] = Query(None, description="Lista de ids separados por vírgula"),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
     db: Session = Depends(get_db),
 ):
-    query = db.query(Pedido)
+    # Itens em uma consulta separada (selectin); nomes de receitas vêm do cache
+    query = db.query(Pedido).options(selectinload(Pedido.itens))
     
+    if ids is not None:
+        pedido_ids = decode_ids(ids)
+        if pedido_ids is None:
+            raise HTTPException(status_code=400, detail="Lista de ids inválida")
+        query = query.filter(Pedido.id.in_(pedido_ids))
     if data_inicio:
         query = query.filter(Pedido.data_entrega >= data_inicio)
     if data_fim:
@@ -33,77 +99,221 @@ def listar_pedidos(
     if status:
         query = query.filter(Pedido.status == status)
     if cliente:
-        query = query.filter(Pedido.cliente.ilike(f"%{cliente}%"))
+        # Coluna normalizada com índice trigram: aceita curinga no início
+        query = query.filter(
+            Pedido.cliente_busca.contains(normalizar(cliente), autoescape=True)
+        )
+    
+    # Paginação keyset em (data_entrega, id), na mesma ordem da listagem
+    query = ordenar_por_cursor(query, cursor, Pedido.data_entrega, Pedido.id)
+    
+    if limit is None:
+        return _pedidos_response(db, query.all())
+    
+    pedidos = cortar_pagina(
+        query.limit(limit + 1).all(),
+        limit,
+        response,
+        lambda pedido: (pedido.data_entrega, pedido.id),
+    )
+    return _pedidos_response(db, pedidos)
+
+
+@router.get(
+    "/clientes",
+    response_model=List[ClienteBuscaResponse],
+    dependencies=[Depends(condicional(PEDIDOS, RECEITAS))],
+)
+@db_endpoint
+def buscar_clientes(
+    q: str = Query(..., min_length=2),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """Busca clientes por nome aproximado, ordenados por similaridade"""
+    termo = normalizar(q)
+    similaridade = func.max(func.similarity(Pedido.cliente_busca, termo))
     
-    pedidos = query.order_by(Pedido.data_entrega.desc()).all()
+    rows = (
+        db.query(
+            Pedido.cliente,
+            similaridade.label("similaridade"),
+            func.count(Pedido.id).label("total_pedidos"),
+            func.max(Pedido.data_entrega).label("ultimo_pedido"),
+        )
+        .filter(
+            or_(
+                Pedido.cliente_busca.op("%")(termo),
+                Pedido.cliente_busca.contains(termo, autoescape=True),
+            )
+        )
+        .group_by(Pedido.cliente)
+        .order_by(similaridade.desc(), Pedido.cliente)
+        .limit(limit)
+        .all()
+    )
     
-    result = []
-    for pedido in pedidos:
-        itens_response = []
-        for item in pedido.itens:
-            receita = db.query(Receita).filter(Receita.id == item.receita_id).first()
-            itens_response.append(
+    return [
+        ClienteBuscaResponse(
+            cliente=row.cliente,
+            similaridade=row.similaridade,
+            total_pedidos=row.total_pedidos,
+            ultimo_pedido=row.ultimo_pedido,
+        )
+        for row in rows
+    ]
+
+
+EXPORT_COLUNAS_CSV = [
+    "pedido_id",
+    "cliente",
+    "status",
+    "data_entrega",
+    "horario",
+    "local",
+    "observacoes",
+    "preco_total",
+    "item_id",
+    "receita_id",
+    "receita_nome",
+    "quantidade",
+    "unidade",
+    "personalizacoes",
+]
+
+
+def _consulta_export(
+    data_inicio: Optional[date],
+    data_fim: Optional[date],
+    status: Optional[StatusPedido],
+) -> Select:
+    """Pedidos e itens (uma linha por item) na ordem do arquivo"""
+    stmt = (
+        select(
+            Pedido.id,
+            Pedido.cliente,
+            Pedido.status,
+            Pedido.data_entrega,
+            Pedido.horario,
+            Pedido.local,
+            Pedido.observacoes,
+            Pedido.preco_total,
+            ItemPedido.id.label("item_id"),
+            ItemPedido.receita_id,
+            ItemPedido.quantidade,
+            ItemPedido.unidade,
+            ItemPedido.personalizacoes,
+        )
+        .outerjoin(ItemPedido, ItemPedido.pedido_id == Pedido.id)
+        .order_by(Pedido.data_entrega, Pedido.id, ItemPedido.id)
+    )
+    if data_inicio:
+        stmt = stmt.where(Pedido.data_entrega >= data_inicio)
+    if data_fim:
+        stmt = stmt.where(Pedido.data_entrega <= data_fim)
+    if status:
+        stmt = stmt.where(Pedido.status == status)
+    return stmt
+
+
+def _linhas_csv(linhas: Iterator[Any], nomes: Dict[int, str]) -> Iterator[List[Any]]:
+    for row in linhas:
+        yield [
+            row.id,
+            row.cliente,
+            row.status.value,
+            row.data_entrega.isoformat(),
+            row.horario.isoformat() if row.horario else "",
+            row.local,
+            row.observacoes,
+            row.preco_total,
+            row.item_id,
+            row.receita_id,
+            nomes.get(row.receita_id),
+            row.quantidade,
+            row.unidade,
+            row.personalizacoes,
+        ]
+
+
+def _export_ndjson(linhas: Iterator[Any], nomes: Dict[int, str]) -> Iterator[str]:
+    # Linhas chegam ordenadas por pedido: agrupa os itens consecutivos
+    for _, grupo in groupby(linhas, key=lambda linha: linha.id):
+        grupo = list(grupo)
+        row = grupo[0]
+        pedido = PedidoResponse(
+            id=row.id,
+            cliente=row.cliente,
+            status=row.status,
+            data_entrega=row.data_entrega,
+            horario=row.horario,
+            local=row.local,
+            observacoes=row.observacoes,
+            preco_total=row.preco_total,
+            itens=[
                 ItemPedidoResponse(
-                    id=item.id,
+                    id=item.item_id,
                     receita_id=item.receita_id,
                     quantidade=item.quantidade,
                     unidade=item.unidade,
                     personalizacoes=item.personalizacoes,
-                    receita_nome=receita.nome if receita else None,
+                    receita_nome=nomes.get(item.receita_id),
                 )
-            )
-        result.append(
-            PedidoResponse(
-                id=pedido.id,
-                cliente=pedido.cliente,
-                status=pedido.status,
-                data_entrega=pedido.data_entrega,
-                horario=pedido.horario,
-                local=pedido.local,
-                observacoes=pedido.observacoes,
-                preco_total=pedido.preco_total,
-                itens=itens_response,
-            )
+                for item in grupo
+                if item.item_id is not None
+            ],
         )
-    return result
+        yield pedido.model_dump_json() + "\n"
 
 
-@router.get("/{pedido_id}", response_model=PedidoResponse)
+@router.get("/export")
+def exportar_pedidos(
+    data_inicio: Optional[date] = Query(None),
+    data_fim: Optional[date] = Query(None),
+    status: Optional[StatusPedido] = Query(None),
+    formato: Literal["csv", "ndjson"] = Query("csv"),
+    db: Session = Depends(get_db),
+):
+    """Exporta pedidos com itens em streaming (CSV: uma linha por item)"""
+    nomes = catalogo_receitas.nomes(db)
+    linhas = executar_em_streaming(_consulta_export(data_inicio, data_fim, status))
+    nome_arquivo = f"pedidos_{data_inicio or 'inicio'}_{data_fim or 'fim'}.{formato}"
+    
+    if formato == "ndjson":
+        corpo, media_type = _export_ndjson(linhas, nomes), "application/x-ndjson"
+    else:
+        corpo = csv_em_blocos(EXPORT_COLUNAS_CSV, _linhas_csv(linhas, nomes))
+        media_type = "text/csv"
+    
+    return StreamingResponse(
+        corpo,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}"'},
+    )
+
+
+@router.get(
+    "/{pedido_id}",
+    response_model=PedidoResponse,
+    dependencies=[Depends(condicional(PEDIDOS, RECEITAS))],
+)
+@db_endpoint
 def obter_pedido(pedido_id: int, db: Session = Depends(get_db)):
-    pedido = db.query(Pedido).filter(Pedido.id == pedido_id).first()
+    pedido = (
+        db.query(Pedido)
+        .options(selectinload(Pedido.itens))
+        .filter(Pedido.id == pedido_id)
+        .first()
+    )
     if not pedido:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
     
-    itens_response = []
-    for item in pedido.itens:
-        receita = db.query(Receita).filter(Receita.id == item.receita_id).first()
-        itens_response.append(
-            ItemPedidoResponse(
-                id=item.id,
-                receita_id=item.receita_id,
-                quantidade=item.quantidade,
-                unidade=item.unidade,
-                personalizacoes=item.personalizacoes,
-                receita_nome=receita.nome if receita else None,
-            )
-        )
-    
-    return PedidoResponse(
-        id=pedido.id,
-        cliente=pedido.cliente,
-        status=pedido.status,
-        data_entrega=pedido.data_entrega,
-        horario=pedido.horario,
-        local=pedido.local,
-        observacoes=pedido.observacoes,
-        preco_total=pedido.preco_total,
-        itens=itens_response,
-    )
+    return _pedidos_response(db, [pedido])[0]
 
 
 @router.post("", response_model=PedidoResponse, status_code=201)
+@db_endpoint
 def criar_pedido(pedido_data: PedidoCreate, db: Session = Depends(get_db)):
-    # Criar pedido
     pedido = Pedido(
         cliente=pedido_data.cliente,
         status=StatusPedido.NOVO,
@@ -112,129 +322,216 @@ def criar_pedido(pedido_data: PedidoCreate, db: Session = Depends(get_db)):
         local=pedido_data.local,
         observacoes=pedido_data.observacoes,
         preco_total=pedido_data.preco_total,
+        itens=[
+            ItemPedido(
+                receita_id=item_data.receita_id,
+                quantidade=item_data.quantidade,
+                unidade=item_data.unidade,
+                personalizacoes=item_data.personalizacoes,
+            )
+            for item_data in pedido_data.itens
+        ],
     )
     db.add(pedido)
     db.flush()
     
-    # Criar itens
-    for item_data in pedido_data.itens:
-        item = ItemPedido(
-            pedido_id=pedido.id,
-            receita_id=item_data.receita_id,
-            quantidade=item_data.quantidade,
-            unidade=item_data.unidade,
-            personalizacoes=item_data.personalizacoes,
-        )
-        db.add(item)
-    
+    # Resposta montada antes do commit, com os ids já gerados pelo flush
+    result = _pedidos_response(db, [pedido])[0]
     db.commit()
-    db.refresh(pedido)
+    versoes.incrementar(PEDIDOS)
+    return result
+
+
+@router.post("/bulk", response_model=PedidoBulkResponse, status_code=201)
+@db_endpoint
+def criar_pedidos_em_lote(
+    pedidos_data: List[PedidoCreate], db: Session = Depends(get_db)
+):
+    """Cria vários pedidos em uma única transação, com inserts multi-linha"""
+    # Valida todas as receitas de uma vez (uma consulta, ou nenhuma com cache)
+    nomes = catalogo_receitas.nomes(
+        db, {item.receita_id for pedido in pedidos_data for item in pedido.itens}
+    )
     
-    # Retornar resposta
-    itens_response = []
-    for item in pedido.itens:
-        receita = db.query(Receita).filter(Receita.id == item.receita_id).first()
-        itens_response.append(
-            ItemPedidoResponse(
-                id=item.id,
-                receita_id=item.receita_id,
-                quantidade=item.quantidade,
-                unidade=item.unidade,
-                personalizacoes=item.personalizacoes,
-                receita_nome=receita.nome if receita else None,
+    resultados: Dict[int, PedidoBulkResultado] = {}
+    validos = []
+    for indice, pedido_data in enumerate(pedidos_data):
+        faltando = sorted({item.receita_id for item in pedido_data.itens} - nomes.keys())
+        if faltando:
+            resultados[indice] = PedidoBulkResultado(
+                indice=indice,
+                erro=f"Receita(s) não encontrada(s): {', '.join(map(str, faltando))}",
             )
+        else:
+            validos.append((indice, pedido_data))
+    
+    if validos:
+        pedido_ids = db.scalars(
+            insert(Pedido).returning(Pedido.id, sort_by_parameter_order=True),
+            [
+                {
+                    "cliente": pedido_data.cliente,
+                    "status": StatusPedido.NOVO,
+                    "data_entrega": pedido_data.data_entrega,
+                    "horario": pedido_data.horario,
+                    "local": pedido_data.local,
+                    "observacoes": pedido_data.observacoes,
+                    "preco_total": pedido_data.preco_total,
+                }
+                for _, pedido_data in validos
+            ],
+        ).all()
+        
+        itens_rows = [
+            {"pedido_id": pedido_id, **item_data.model_dump()}
+            for pedido_id, (_, pedido_data) in zip(pedido_ids, validos)
+            for item_data in pedido_data.itens
+        ]
+        item_ids = iter(
+            db.scalars(
+                insert(ItemPedido).returning(ItemPedido.id, sort_by_parameter_order=True),
+                itens_rows,
+            ).all()
+            if itens_rows
+            else []
         )
+        db.commit()
+        versoes.incrementar(PEDIDOS)
+        
+        for pedido_id, (indice, pedido_data) in zip(pedido_ids, validos):
+            resultados[indice] = PedidoBulkResultado(
+                indice=indice,
+                pedido=PedidoResponse(
+                    id=pedido_id,
+                    status=StatusPedido.NOVO,
+                    itens=[
+                        ItemPedidoResponse(
+                            id=next(item_ids),
+                            receita_nome=nomes.get(item_data.receita_id),
+                            **item_data.model_dump(),
+                        )
+                        for item_data in pedido_data.itens
+                    ],
+                    **pedido_data.model_dump(exclude={"itens"}),
+                ),
+            )
     
-    return PedidoResponse(
-        id=pedido.id,
-        cliente=pedido.cliente,
-        status=pedido.status,
-        data_entrega=pedido.data_entrega,
-        horario=pedido.horario,
-        local=pedido.local,
-        observacoes=pedido.observacoes,
-        preco_total=pedido.preco_total,
-        itens=itens_response,
+    return PedidoBulkResponse(
+        criados=len(validos),
+        erros=len(pedidos_data) - len(validos),
+        resultados=[resultados[indice] for indice in range(len(pedidos_data))],
     )
 
 
-@router.patch("/{pedido_id}", response_model=PedidoResponse)
-def atualizar_pedido(
-    pedido_id: int, pedido_data: PedidoUpdate, db: Session = Depends(get_db)
-):
-    pedido = db.query(Pedido).filter(Pedido.id == pedido_id).first()
+def _atualizar_e_responder(
+    db: Session, pedido_id: int, valores: Dict[str, Any]
+) -> PedidoResponse:
+    """Aplica um UPDATE ... RETURNING e monta a resposta sem recarregar o pedido"""
+    if valores:
+        stmt = (
+            update(Pedido)
+            .where(Pedido.id == pedido_id)
+            .values(**valores)
+            .returning(Pedido)
+        )
+    else:
+        stmt = select(Pedido).where(Pedido.id == pedido_id)
+    
+    pedido = db.scalars(stmt).first()
     if not pedido:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
     
-    update_data = pedido_data.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(pedido, field, value)
+    result = _pedidos_response(db, [pedido])[0]
     
+    # Baixa (ou estorno) dos ingredientes na mesma transação da mudança de status
+    estoque_alterado = False
+    if valores.get("status") in STATUS_COM_ESTOQUE:
+        baixa = sincronizar_estoque_pedidos(db, [pedido_id])
+        estoque_alterado = baixa.alterado
+        result.baixa_pendente = [
+            BaixaPendenteResponse(**pendente._asdict()) for pendente in baixa.pendentes
+        ]
     db.commit()
-    db.refresh(pedido)
+    versoes.incrementar(PEDIDOS)
+    if estoque_alterado:
+        versoes.incrementar(ESTOQUE)
+    return result
+
+
+@router.patch("/status", response_model=PedidoStatusLoteResponse)
+@db_endpoint
+def atualizar_status_em_lote(
+    lote_data: PedidoStatusLoteUpdate, db: Session = Depends(get_db)
+):
+    """Aplica uma transição de status a vários pedidos com um único UPDATE"""
+    if not lote_data.ids and not lote_data.data_entrega:
+        raise HTTPException(
+            status_code=400, detail="Informe ids ou data_entrega para o lote"
+        )
     
-    itens_response = []
-    for item in pedido.itens:
-        receita = db.query(Receita).filter(Receita.id == item.receita_id).first()
-        itens_response.append(
-            ItemPedidoResponse(
-                id=item.id,
-                receita_id=item.receita_id,
-                quantidade=item.quantidade,
-                unidade=item.unidade,
-                personalizacoes=item.personalizacoes,
-                receita_nome=receita.nome if receita else None,
+    # Status de origem a partir dos quais a transição é permitida
+    origens = [
+        origem
+        for origem, destinos in TRANSICOES_STATUS.items()
+        if lote_data.status in destinos
+    ]
+    if lote_data.status_atual:
+        if lote_data.status_atual not in origens:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    f"Transição de '{lote_data.status_atual.value}' para "
+                    f"'{lote_data.status.value}' não permitida"
+                ),
             )
-        )
+        origens = [lote_data.status_atual]
     
-    return PedidoResponse(
-        id=pedido.id,
-        cliente=pedido.cliente,
-        status=pedido.status,
-        data_entrega=pedido.data_entrega,
-        horario=pedido.horario,
-        local=pedido.local,
-        observacoes=pedido.observacoes,
-        preco_total=pedido.preco_total,
-        itens=itens_response,
+    stmt = update(Pedido).where(Pedido.status.in_(origens))
+    if lote_data.ids:
+        stmt = stmt.where(Pedido.id.in_(lote_data.ids))
+    if lote_data.data_entrega:
+        stmt = stmt.where(Pedido.data_entrega == lote_data.data_entrega)
+    
+    atualizados = db.scalars(
+        stmt.values(status=lote_data.status)
+        .returning(Pedido.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    estoque_alterado = False
+    pendentes = []
+    if lote_data.status in STATUS_COM_ESTOQUE:
+        baixa = sincronizar_estoque_pedidos(db, atualizados)
+        estoque_alterado, pendentes = baixa.alterado, baixa.pendentes
+    db.commit()
+    if atualizados:
+        versoes.incrementar(PEDIDOS)
+    if estoque_alterado:
+        versoes.incrementar(ESTOQUE)
+    
+    atualizados_set = set(atualizados)
+    return PedidoStatusLoteResponse(
+        status=lote_data.status,
+        atualizados=sorted(atualizados),
+        ignorados=sorted(set(lote_data.ids or []) - atualizados_set),
+        baixa_pendente=[
+            BaixaPendenteResponse(**pendente._asdict()) for pendente in pendentes
+        ],
+    )
+
+
+@router.patch("/{pedido_id}", response_model=PedidoResponse)
+@db_endpoint
+def atualizar_pedido(
+    pedido_id: int, pedido_data: PedidoUpdate, db: Session = Depends(get_db)
+):
+    return _atualizar_e_responder(
+        db, pedido_id, pedido_data.model_dump(exclude_unset=True)
     )
 
 
 @router.patch("/{pedido_id}/status", response_model=PedidoResponse)
+@db_endpoint
 def atualizar_status_pedido(
     pedido_id: int, status_data: PedidoStatusUpdate, db: Session = Depends(get_db)
 ):
-    pedido = db.query(Pedido).filter(Pedido.id == pedido_id).first()
-    if not pedido:
-        raise HTTPException(status_code=404, detail="Pedido não encontrado")
-    
-    pedido.status = status_data.status
-    db.commit()
-    db.refresh(pedido)
-    
-    itens_response = []
-    for item in pedido.itens:
-        receita = db.query(Receita).filter(Receita.id == item.receita_id).first()
-        itens_response.append(
-            ItemPedidoResponse(
-                id=item.id,
-                receita_id=item.receita_id,
-                quantidade=item.quantidade,
-                unidade=item.unidade,
-                personalizacoes=item.personalizacoes,
-                receita_nome=receita.nome if receita else None,
-            )
-        )
-    
-    return PedidoResponse(
-        id=pedido.id,
-        cliente=pedido.cliente,
-        status=pedido.status,
-        data_entrega=pedido.data_entrega,
-        horario=pedido.horario,
-        local=pedido.local,
-        observacoes=pedido.observacoes,
-        preco_total=pedido.preco_total,
-        itens=itens_response,
-    )
-
+    return _atualizar_e_responder(db, pedido_id, {"status": status_data.status})
@@ -0,0 +1,109 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from sqlalchemy import case, func, select
+from typing import Optional
+from datetime import date, timedelta
+from decimal import Decimal
+from app.db.database import get_db, db_endpoint
+from app.models.pedido import Pedido, ItemPedido, StatusPedido
+from app.models.receita import IngredienteReceita
+from app.models.ingrediente import Ingrediente
+from app.models.estoque import Estoque
+from app.services.versoes import condicional, PEDIDOS, RECEITAS, ESTOQUE
+from app.schemas.planejamento import (
+    ListaComprasResponse,
+    ItemListaComprasResponse,
+    PeriodoResponse,
+)
+
+router = APIRouter(prefix="/api/planejamento", tags=["planejamento"])
+
+
+def _periodo(
+    data_inicio: Optional[date] = Query(None),
+    data_fim: Optional[date] = Query(None),
+) -> PeriodoResponse:
+    """Período pedido; sem datas, os próximos 7 dias a partir de hoje"""
+    inicio = data_inicio or date.today()
+    return PeriodoResponse(inicio=inicio, fim=data_fim or inicio + timedelta(days=7))
+
+
+def _chave_periodo(periodo: PeriodoResponse = Depends(_periodo)) -> str:
+    # O período resolvido entra no ETag: a janela padrão muda à meia-noite sem escrita
+    return f"{periodo.inicio.isoformat()}_{periodo.fim.isoformat()}"
+
+
+@router.get(
+    "/lista-compras",
+    response_model=ListaComprasResponse,
+    dependencies=[
+        Depends(condicional(PEDIDOS, RECEITAS, ESTOQUE, variante=_chave_periodo))
+    ],
+)
+@db_endpoint
+def gerar_lista_compras(
+    periodo: PeriodoResponse = Depends(_periodo),
+    db: Session = Depends(get_db),
+):
+    inicio, fim = periodo.inicio, periodo.fim
+
+    # Necessidade por ingrediente, já somada na unidade base (500 g + 1 kg = 1500 g)
+    necessidades = (
+        select(
+            IngredienteReceita.ingrediente_id,
+            IngredienteReceita.unidade_base,
+            func.sum(ItemPedido.quantidade * IngredienteReceita.quantidade_base).label("quantidade"),
+        )
+        .join(ItemPedido, ItemPedido.receita_id == IngredienteReceita.receita_id)
+        .join(Pedido, Pedido.id == ItemPedido.pedido_id)
+        .where(
+            Pedido.data_entrega >= inicio,
+            Pedido.data_entrega <= fim,
+            Pedido.status != StatusPedido.CANCELADO,
+        )
+        .group_by(IngredienteReceita.ingrediente_id, IngredienteReceita.unidade_base)
+        .subquery()
+    )
+
+    # Estoque convertido para a mesma unidade base (zero se a unidade não é compatível)
+    estoque_base = case(
+        (
+            Ingrediente.unidade_base == necessidades.c.unidade_base,
+            func.coalesce(Estoque.quantidade_atual, 0) * Ingrediente.fator_base,
+        ),
+        else_=0,
+    )
+    rows = db.execute(
+        select(
+            necessidades.c.ingrediente_id,
+            Ingrediente.nome,
+            necessidades.c.unidade_base,
+            necessidades.c.quantidade,
+            estoque_base.label("quantidade_atual"),
+        )
+        .join(Ingrediente, Ingrediente.id == necessidades.c.ingrediente_id)
+        .outerjoin(Estoque, Estoque.ingrediente_id == necessidades.c.ingrediente_id)
+        .order_by(Ingrediente.nome, necessidades.c.unidade_base)
+    ).all()
+
+    lista_compras = []
+    for row in rows:
+        necessaria = Decimal(row.quantidade or 0)
+        atual = Decimal(row.quantidade_atual or 0)
+        comprar = necessaria - atual
+        if comprar > 0:
+            lista_compras.append(
+                ItemListaComprasResponse(
+                    ingrediente_id=row.ingrediente_id,
+                    ingrediente=row.nome,
+                    quantidade_necessaria=necessaria,
+                    quantidade_atual=atual,
+                    quantidade_comprar=comprar,
+                    unidade=row.unidade_base,
+                )
+            )
+
+    return ListaComprasResponse(
+        periodo=periodo,
+        lista_compras=lista_compras,
+    )
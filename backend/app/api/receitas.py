@@ -1,95 +1,85 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import delete, insert, update
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.db.database import get_db
+from typing import Dict, List, Optional
+from collections import defaultdict
+from app.db.database import get_db, db_endpoint
 from app.models.receita import Receita, IngredienteReceita
-from app.models.ingrediente import Ingrediente
+from app.services.receita_cache import catalogo_receitas
+from app.services.custos import recalcular_custos_receitas
+from app.services.versoes import versoes, condicional, RECEITAS
+from app.services.parametros import decode_ids
 from app.schemas.receita import (
     ReceitaCreate,
     ReceitaUpdate,
     ReceitaResponse,
-    IngredienteReceitaResponse,
+    ReceitaAtualizadaResponse,
+    IngredienteReceitaCreate,
+    AlteracoesIngredientes,
 )
 
 router = APIRouter(prefix="/api/receitas", tags=["receitas"])
 
 
-@router.get("", response_model=List[ReceitaResponse])
+@router.get(
+    "",
+    response_model=List[ReceitaResponse],
+    dependencies=[Depends(condicional(RECEITAS))],
+)
+@db_endpoint
 def listar_receitas(
-    nome: Optional[str] = Query(None), db: Session = Depends(get_db)
+    nome: Optional[str] = Query(None),
+    ids: Optional[str] = Query(None, description="Lista de ids separados por vírgula"),
+    db: Session = Depends(get_db),
 ):
-    query = db.query(Receita)
+    catalogo = catalogo_receitas.receitas(db)
+    receitas = catalogo.values()
+    
+    if ids is not None:
+        receita_ids = decode_ids(ids)
+        if receita_ids is None:
+            raise HTTPException(status_code=400, detail="Lista de ids inválida")
+        # Na ordem pedida; ids inexistentes são ignorados
+        receitas = [catalogo[rid] for rid in receita_ids if rid in catalogo]
     
     if nome:
-        query = query.filter(Receita.nome.ilike(f"%{nome}%"))
-    
-    receitas = query.all()
-    
-    result = []
-    for receita in receitas:
-        ingredientes_response = []
-        for ing_rec in receita.ingredientes:
-            ingrediente = (
-                db.query(Ingrediente)
-                .filter(Ingrediente.id == ing_rec.ingrediente_id)
-                .first()
-            )
-            ingredientes_response.append(
-                IngredienteReceitaResponse(
-                    id=ing_rec.id,
-                    ingrediente_id=ing_rec.ingrediente_id,
-                    quantidade=ing_rec.quantidade,
-                    unidade=ing_rec.unidade,
-                    ingrediente_nome=ingrediente.nome if ingrediente else None,
-                )
-            )
-        result.append(
-            ReceitaResponse(
-                id=receita.id,
-                nome=receita.nome,
-                descricao=receita.descricao,
-                tempo_preparo=receita.tempo_preparo,
-                rendimento=receita.rendimento,
-                ingredientes=ingredientes_response,
-            )
-        )
-    return result
+        termo = nome.lower()
+        receitas = [receita for receita in receitas if termo in receita.nome.lower()]
+    
+    return list(receitas)
 
 
-@router.get("/{receita_id}", response_model=ReceitaResponse)
+@router.get(
+    "/busca",
+    response_model=List[ReceitaResponse],
+    dependencies=[Depends(condicional(RECEITAS))],
+)
+@db_endpoint
+def buscar_receitas(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    """Busca sem acentos por palavras do nome, com as receitas mais relevantes primeiro"""
+    return catalogo_receitas.buscar(db, q, limit)
+
+
+@router.get(
+    "/{receita_id}",
+    response_model=ReceitaResponse,
+    dependencies=[Depends(condicional(RECEITAS))],
+)
+@db_endpoint
 def obter_receita(receita_id: int, db: Session = Depends(get_db)):
-    receita = db.query(Receita).filter(Receita.id == receita_id).first()
+    receita = catalogo_receitas.receitas(db).get(receita_id)
     if not receita:
         raise HTTPException(status_code=404, detail="Receita não encontrada")
     
-    ingredientes_response = []
-    for ing_rec in receita.ingredientes:
-        ingrediente = (
-            db.query(Ingrediente)
-            .filter(Ingrediente.id == ing_rec.ingrediente_id)
-            .first()
-        )
-        ingredientes_response.append(
-            IngredienteReceitaResponse(
-                id=ing_rec.id,
-                ingrediente_id=ing_rec.ingrediente_id,
-                quantidade=ing_rec.quantidade,
-                unidade=ing_rec.unidade,
-                ingrediente_nome=ingrediente.nome if ingrediente else None,
-            )
-        )
-    
-    return ReceitaResponse(
-        id=receita.id,
-        nome=receita.nome,
-        descricao=receita.descricao,
-        tempo_preparo=receita.tempo_preparo,
-        rendimento=receita.rendimento,
-        ingredientes=ingredientes_response,
-    )
+    return receita
 
 
 @router.post("", response_model=ReceitaResponse, status_code=201)
+@db_endpoint
 def criar_receita(receita_data: ReceitaCreate, db: Session = Depends(get_db)):
     receita = Receita(
         nome=receita_data.nome,
@@ -110,37 +100,77 @@ def criar_receita(receita_data: ReceitaCreate, db: Session = Depends(get_db)):
         )
         db.add(ing_rec)
     
+    receita_id = receita.id
+    db.flush()
+    recalcular_custos_receitas(db, [receita_id])
     db.commit()
-    db.refresh(receita)
-    
-    ingredientes_response = []
-    for ing_rec in receita.ingredientes:
-        ingrediente = (
-            db.query(Ingrediente)
-            .filter(Ingrediente.id == ing_rec.ingrediente_id)
-            .first()
-        )
-        ingredientes_response.append(
-            IngredienteReceitaResponse(
-                id=ing_rec.id,
-                ingrediente_id=ing_rec.ingrediente_id,
-                quantidade=ing_rec.quantidade,
-                unidade=ing_rec.unidade,
-                ingrediente_nome=ingrediente.nome if ingrediente else None,
+    catalogo_receitas.invalidar()
+    versoes.incrementar(RECEITAS)
+    
+    return catalogo_receitas.receitas(db)[receita_id]
+
+
+def _sincronizar_ingredientes(
+    db: Session, receita_id: int, novos: List[IngredienteReceitaCreate]
+) -> AlteracoesIngredientes:
+    """Aplica só a diferença entre as linhas atuais e as novas"""
+    atuais = (
+        db.query(IngredienteReceita)
+        .filter(IngredienteReceita.receita_id == receita_id)
+        .order_by(IngredienteReceita.id)
+        .all()
+    )
+    
+    # Linhas atuais por ingrediente, pareadas na ordem com as novas
+    por_ingrediente: Dict[int, List[IngredienteReceita]] = defaultdict(list)
+    for linha in atuais:
+        por_ingrediente[linha.ingrediente_id].append(linha)
+    
+    atualizacoes = []
+    insercoes = []
+    for ing_data in novos:
+        candidatas = por_ingrediente.get(ing_data.ingrediente_id)
+        if not candidatas:
+            insercoes.append(
+                {
+                    "receita_id": receita_id,
+                    "ingrediente_id": ing_data.ingrediente_id,
+                    "quantidade": ing_data.quantidade,
+                    "unidade": ing_data.unidade,
+                }
             )
+            continue
+        linha = candidatas.pop(0)
+        if linha.quantidade != ing_data.quantidade or linha.unidade != ing_data.unidade:
+            atualizacoes.append(
+                {"id": linha.id, "quantidade": ing_data.quantidade, "unidade": ing_data.unidade}
+            )
+    remocoes = [linha.id for linhas in por_ingrediente.values() for linha in linhas]
+    
+    if atualizacoes:
+        db.execute(update(IngredienteReceita), atualizacoes)
+    if remocoes:
+        db.execute(
+            delete(IngredienteReceita)
+            .where(IngredienteReceita.id.in_(remocoes))
+            .execution_options(synchronize_session=False)
         )
+    inseridos = []
+    if insercoes:
+        inseridos = db.scalars(
+            insert(IngredienteReceita).returning(IngredienteReceita.id),
+            insercoes,
+        ).all()
     
-    return ReceitaResponse(
-        id=receita.id,
-        nome=receita.nome,
-        descricao=receita.descricao,
-        tempo_preparo=receita.tempo_preparo,
-        rendimento=receita.rendimento,
-        ingredientes=ingredientes_response,
+    return AlteracoesIngredientes(
+        inseridos=sorted(inseridos),
+        atualizados=sorted(linha["id"] for linha in atualizacoes),
+        removidos=sorted(remocoes),
     )
 
 
-@router.patch("/{receita_id}", response_model=ReceitaResponse)
+@router.patch("/{receita_id}", response_model=ReceitaAtualizadaResponse)
+@db_endpoint
 def atualizar_receita(
     receita_id: int, receita_data: ReceitaUpdate, db: Session = Depends(get_db)
 ):
@@ -150,53 +180,24 @@ def atualizar_receita(
     
     update_data = receita_data.model_dump(exclude_unset=True)
     
-    # Atualizar ingredientes se fornecido
-    if "ingredientes" in update_data:
-        # Remover ingredientes antigos
-        db.query(IngredienteReceita).filter(
-            IngredienteReceita.receita_id == receita_id
-        ).delete()
-        
-        # Adicionar novos ingredientes
-        for ing_data in update_data.pop("ingredientes"):
-            ing_rec = IngredienteReceita(
-                receita_id=receita.id,
-                ingrediente_id=ing_data.ingrediente_id,
-                quantidade=ing_data.quantidade,
-                unidade=ing_data.unidade,
-            )
-            db.add(ing_rec)
+    # Atualizar ingredientes se fornecido: apenas o que mudou
+    alteracoes = None
+    if update_data.pop("ingredientes", None) is not None:
+        alteracoes = _sincronizar_ingredientes(
+            db, receita_id, receita_data.ingredientes
+        )
+        if alteracoes.inseridos or alteracoes.atualizados or alteracoes.removidos:
+            recalcular_custos_receitas(db, [receita_id])
     
     # Atualizar outros campos
     for field, value in update_data.items():
         setattr(receita, field, value)
     
     db.commit()
-    db.refresh(receita)
-    
-    ingredientes_response = []
-    for ing_rec in receita.ingredientes:
-        ingrediente = (
-            db.query(Ingrediente)
-            .filter(Ingrediente.id == ing_rec.ingrediente_id)
-            .first()
-        )
-        ingredientes_response.append(
-            IngredienteReceitaResponse(
-                id=ing_rec.id,
-                ingrediente_id=ing_rec.ingrediente_id,
-                quantidade=ing_rec.quantidade,
-                unidade=ing_rec.unidade,
-                ingrediente_nome=ingrediente.nome if ingrediente else None,
-            )
-        )
+    catalogo_receitas.invalidar()
+    versoes.incrementar(RECEITAS)
     
-    return ReceitaResponse(
-        id=receita.id,
-        nome=receita.nome,
-        descricao=receita.descricao,
-        tempo_preparo=receita.tempo_preparo,
-        rendimento=receita.rendimento,
-        ingredientes=ingredientes_response,
+    return ReceitaAtualizadaResponse(
+        **catalogo_receitas.receitas(db)[receita_id].model_dump(),
+        alteracoes=alteracoes,
     )
-
@@ -2,16 +2,17 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
 from datetime import date, datetime
-from app.db.database import get_db
+from app.db.database import get_db, db_endpoint
 from app.models.pedido import Pedido, StatusPedido
 from app.models.agenda import AgendaEntrega
-from app.models.estoque import Estoque
+from app.models.estoque import Estoque, ESTOQUE_BAIXO
 from app.schemas.stats import StatsResponse
 
 router = APIRouter(prefix="/api/stats", tags=["stats"])
 
 
 @router.get("", response_model=StatsResponse)
+@db_endpoint
 def obter_stats(db: Session = Depends(get_db)):
     hoje = date.today()
     
@@ -47,11 +48,11 @@ def obter_stats(db: Session = Depends(get_db)):
         .count()
     )
     
-    # Estoque baixo (quantidade atual <= ponto de reposição)
+    # Estoque baixo (quantidade atual < ponto de reposição), pelo índice parcial
     estoque_baixo = (
-        db.query(Estoque)
-        .filter(Estoque.quantidade_atual <= Estoque.ponto_reposicao)
-        .count()
+        db.query(func.count(Estoque.ingrediente_id))
+        .filter(ESTOQUE_BAIXO)
+        .scalar()
     )
     
     # Total de pedidos de hoje (soma dos preços)
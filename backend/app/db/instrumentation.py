@@ -0,0 +1,113 @@
+"""Instrumentação de SQL por request: contagem, tempo e detector de N+1"""
+
+import contextvars
+import logging
+import re
+import time
+from collections import Counter
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("app.sql")
+
+_estatisticas: contextvars.ContextVar[Optional["EstatisticasSQL"]] = contextvars.ContextVar(
+    "estatisticas_sql", default=None
+)
+
+
+class ConsultasRepetidasError(RuntimeError):
+    """Mesmo formato de statement executado mais vezes que o permitido"""
+
+
+class EstatisticasSQL:
+    """Statements e tempo de banco acumulados durante um request"""
+
+    def __init__(self, max_repeticoes: int = 0, falhar: bool = False):
+        self.consultas = 0
+        self.tempo = 0.0
+        self.formatos: Counter = Counter()
+        self.max_repeticoes = max_repeticoes
+        self.falhar = falhar
+        self.alertados = set()
+
+    def registrar(self, duracao: float) -> None:
+        self.consultas += 1
+        self.tempo += duracao
+
+    def verificar_repeticao(self, statement: str) -> None:
+        if not self.max_repeticoes:
+            return
+        formato = formato_statement(statement)
+        self.formatos[formato] += 1
+        if self.formatos[formato] <= self.max_repeticoes:
+            return
+        mensagem = (
+            f"Statement executado {self.formatos[formato]} vezes no mesmo request "
+            f"(limite {self.max_repeticoes}), possível N+1: {formato[:200]}"
+        )
+        if self.falhar:
+            raise ConsultasRepetidasError(mensagem)
+        if formato not in self.alertados:
+            self.alertados.add(formato)
+            logger.warning(mensagem)
+
+
+def formato_statement(statement: str) -> str:
+    """Normaliza o SQL para agrupar statements com o mesmo formato"""
+    formato = re.sub(r"\s+", " ", statement).strip()
+    # Listas IN expandidas (selectin, filtros por ids) variam de tamanho
+    return re.sub(r"IN \([^()]*\)", "IN (...)", formato)
+
+
+def instrumentar_engine(engine: Engine) -> None:
+    """Registra os eventos de cursor que alimentam as estatísticas do request"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        estatisticas = _estatisticas.get()
+        if estatisticas is not None:
+            estatisticas.verificar_repeticao(statement)
+        conn.info.setdefault("inicio_consulta", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        inicio = conn.info["inicio_consulta"].pop()
+        estatisticas = _estatisticas.get()
+        if estatisticas is not None:
+            estatisticas.registrar(time.perf_counter() - inicio)
+
+    @event.listens_for(engine, "handle_error")
+    def _erro(contexto):
+        pilha = contexto.connection.info.get("inicio_consulta") if contexto.connection else None
+        if pilha:
+            pilha.pop()
+
+
+def criar_middleware(max_repeticoes: int = 0, falhar: bool = False):
+    """Middleware HTTP que expõe as estatísticas em Server-Timing e no log"""
+
+    async def sql_middleware(request: Request, call_next):
+        estatisticas = EstatisticasSQL(max_repeticoes, falhar)
+        token = _estatisticas.set(estatisticas)
+        try:
+            response = await call_next(request)
+        finally:
+            _estatisticas.reset(token)
+        
+        duracao_ms = estatisticas.tempo * 1000
+        response.headers["Server-Timing"] = (
+            f'db;dur={duracao_ms:.2f};desc="{estatisticas.consultas} queries"'
+        )
+        if estatisticas.consultas:
+            logger.info(
+                "%s %s: %d queries, %.2f ms no banco",
+                request.method,
+                request.url.path,
+                estatisticas.consultas,
+                duracao_ms,
+            )
+        return response
+
+    return sql_middleware
@@ -0,0 +1,68 @@
+"""Pools de conexão instrumentados para métricas de espera e ocupação"""
+
+import threading
+import time
+from typing import Any, Dict
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class MetricasPool:
+    """Acumula tempo de espera no checkout de conexões"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self._lock = threading.Lock()
+
+    def registrar_espera(self, segundos: float, timeout: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.espera_total += segundos
+            self.espera_max = max(self.espera_max, segundos)
+            if timeout:
+                self.timeouts += 1
+
+
+class _PoolInstrumentado:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metricas = MetricasPool()
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        timeout = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timeout = True
+            raise
+        finally:
+            self.metricas.registrar_espera(time.perf_counter() - inicio, timeout)
+
+
+class QueuePoolInstrumentado(_PoolInstrumentado, QueuePool):
+    pass
+
+
+class AsyncQueuePoolInstrumentado(_PoolInstrumentado, AsyncAdaptedQueuePool):
+    pass
+
+
+def snapshot_pool(pool: Any) -> Dict[str, Any]:
+    """Estado atual do pool e métricas acumuladas desde a criação"""
+    metricas = getattr(pool, "metricas", None) or MetricasPool()
+    checkouts = metricas.checkouts
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": checkouts,
+        "timeouts": metricas.timeouts,
+        "espera_total_ms": metricas.espera_total * 1000,
+        "espera_media_ms": (metricas.espera_total / checkouts * 1000) if checkouts else 0.0,
+        "espera_max_ms": metricas.espera_max * 1000,
+    }
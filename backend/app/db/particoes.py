@@ -0,0 +1,42 @@
+"""Manutenção das partições mensais do livro de movimentações"""
+
+import logging
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+
+def garantir_particoes(engine: Engine, meses_a_frente: int) -> bool:
+    """Cria as partições do mês atual e dos próximos meses (idempotente)
+
+    Movimentações fora das partições existentes caem na partição default;
+    a função do banco move essas linhas ao criar a partição do mês. Por isso
+    uma falha aqui (banco fora do ar, migração 007 pendente) só é registrada:
+    devolve False e a próxima execução tenta de novo.
+    """
+    if engine.dialect.name != "postgresql":
+        return True
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                text("SELECT criar_particoes_movimentacoes(:meses)"), {"meses": meses_a_frente}
+            )
+    except SQLAlchemyError as exc:
+        logger.warning("Não foi possível criar as partições de movimentacoes_estoque: %s", exc)
+        return False
+    logger.info(
+        "Partições de movimentacoes_estoque garantidas (%s meses à frente)", meses_a_frente
+    )
+    return True
+
+
+if __name__ == "__main__":
+    # Manutenção avulsa (cron, deploy): python -m app.db.particoes
+    import sys
+    from app.config import config
+    from app.db.database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(0 if garantir_particoes(engine, config.db_particoes_meses_a_frente) else 1)
@@ -1,7 +1,14 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import api_router
 from app.config import config
+from app.db.database import engine
+from app.db.instrumentation import criar_middleware
+from app.db.particoes import garantir_particoes
+from app.services.snapshots import gerar_snapshot_diario
+from app.services.pagination import NEXT_CURSOR_HEADER
+from app.services.tarefas import repetir
 
 app = FastAPI(
     title=config.api_title,
@@ -16,11 +23,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
+)
+
+# Statements e tempo de banco por request (Server-Timing)
+app.middleware("http")(
+    criar_middleware(config.sql_max_repeticoes, config.sql_falhar_repeticoes)
 )
 
 # Incluir routers
 app.include_router(api_router)
 
+# Manutenção periódica em segundo plano, sem prender o startup ao banco:
+# partições mensais do livro de estoque e snapshot do dia anterior
+tarefas_periodicas = []
+
+@app.on_event("startup")
+async def iniciar_tarefas_periodicas():
+    if config.db_particoes_intervalo_horas > 0:
+        tarefas_periodicas.append(
+            asyncio.create_task(
+                repetir(
+                    "partições",
+                    config.db_particoes_intervalo_horas * 3600,
+                    lambda: garantir_particoes(engine, config.db_particoes_meses_a_frente),
+                )
+            )
+        )
+    if config.estoque_snapshots_intervalo_horas > 0:
+        tarefas_periodicas.append(
+            asyncio.create_task(
+                repetir(
+                    "snapshots de estoque",
+                    config.estoque_snapshots_intervalo_horas * 3600,
+                    gerar_snapshot_diario,
+                )
+            )
+        )
+
+@app.on_event("shutdown")
+async def parar_tarefas_periodicas():
+    for tarefa in tarefas_periodicas:
+        tarefa.cancel()
+    tarefas_periodicas.clear()
+
 @app.get("/")
 async def root():
     return {"message": "Docildos API", "status": "running"}
@@ -1,7 +1,7 @@
 from app.models.ingrediente import Ingrediente
 from app.models.receita import Receita, IngredienteReceita
 from app.models.pedido import Pedido, ItemPedido, StatusPedido
-from app.models.estoque import Estoque, MovimentacaoEstoque, TipoMovimentacao
+from app.models.estoque import Estoque, MovimentacaoEstoque, TipoMovimentacao, SnapshotEstoque
 from app.models.agenda import AgendaEntrega
 
 __all__ = [
@@ -14,6 +14,7 @@ __all__ = [
     "Estoque",
     "MovimentacaoEstoque",
     "TipoMovimentacao",
+    "SnapshotEstoque",
     "AgendaEntrega",
 ]
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Numeric, Date, Enum as SQLEnum
+from sqlalchemy import Column, Integer, ForeignKey, Numeric, Date, String, Index, PrimaryKeyConstraint, Enum as SQLEnum, text
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 import enum
@@ -21,16 +21,57 @@ class Estoque(Base):
     
     ingrediente = relationship("Ingrediente")
 
+    __table_args__ = (
+        # Índice parcial só com os itens abaixo do ponto de reposição
+        Index(
+            "ix_estoque_baixo",
+            "ingrediente_id",
+            postgresql_where=text("quantidade_atual < ponto_reposicao"),
+        ),
+    )
+
+
+# Critério de estoque baixo; mesma expressão do índice parcial ix_estoque_baixo
+ESTOQUE_BAIXO = Estoque.quantidade_atual < Estoque.ponto_reposicao
+
 
 class MovimentacaoEstoque(Base):
+    """Livro de movimentações, particionado por mês em data (ver migração 007)"""
+
     __tablename__ = "movimentacoes_estoque"
 
-    id = Column(Integer, primary_key=True, index=True)
-    ingrediente_id = Column(Integer, ForeignKey("ingredientes.id"), nullable=False, index=True)
+    id = Column(Integer, nullable=False, autoincrement=True)
+    ingrediente_id = Column(Integer, ForeignKey("ingredientes.id"), nullable=False)
     tipo = Column(SQLEnum(TipoMovimentacao), nullable=False)
     quantidade = Column(Numeric(10, 2), nullable=False)
     motivo = Column(String)  # produção, compra, ajuste, etc.
-    data = Column(Date, nullable=False, default=date.today, index=True)
+    data = Column(Date, nullable=False, default=date.today)
+    # Pedido que originou a baixa automática (ou seu estorno)
+    pedido_id = Column(Integer, ForeignKey("pedidos.id"))
     
     ingrediente = relationship("Ingrediente")
 
+    __table_args__ = (
+        # A chave de partição precisa fazer parte da chave primária; com data na
+        # frente, a PK de cada partição atende a ordem (data, id) do histórico
+        PrimaryKeyConstraint("data", "id"),
+        # BRIN: minúsculo, complementa a PK em varreduras longas por período
+        Index("ix_movimentacoes_estoque_data_brin", "data", postgresql_using="brin"),
+        Index("ix_movimentacoes_estoque_ingrediente_data", "ingrediente_id", "data"),
+        Index(
+            "ix_movimentacoes_estoque_pedido_id",
+            "pedido_id",
+            postgresql_where=text("pedido_id IS NOT NULL"),
+        ),
+        {"postgresql_partition_by": "RANGE (data)"},
+    )
+
+
+class SnapshotEstoque(Base):
+    """Saldo de um ingrediente ao fim de um dia, para consultas de posição histórica"""
+
+    __tablename__ = "snapshots_estoque"
+
+    ingrediente_id = Column(Integer, ForeignKey("ingredientes.id"), primary_key=True)
+    data = Column(Date, primary_key=True)
+    quantidade = Column(Numeric(10, 2), nullable=False)
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, Numeric, Computed
 from app.db.database import Base
+from app.services.unidades import fator_base_sql, unidade_base_sql
 
 
 class Ingrediente(Base):
@@ -8,4 +9,7 @@ class Ingrediente(Base):
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String, nullable=False, unique=True, index=True)
     unidade_padrao = Column(String, nullable=False)  # g, kg, ml, l, un
+    # Unidade base e fator da unidade padrão, mantidos pelo banco
+    unidade_base = Column(String, Computed(unidade_base_sql("unidade_padrao"), persisted=True))
+    fator_base = Column(Numeric(14, 4), Computed(fator_base_sql("unidade_padrao"), persisted=True))
 
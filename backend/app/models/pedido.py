@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Date, Time, Text, Numeric, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Date, Time, Text, Numeric, Boolean, ForeignKey, Computed, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from app.db.database import Base
+from app.services.busca import normalizar_sql
 import enum
 
 
@@ -12,27 +13,50 @@ class StatusPedido(str, enum.Enum):
     CANCELADO = "cancelado"
 
 
+# Transições de status permitidas no quadro de produção
+TRANSICOES_STATUS = {
+    StatusPedido.NOVO: {StatusPedido.EM_PRODUCAO, StatusPedido.CANCELADO},
+    StatusPedido.EM_PRODUCAO: {StatusPedido.PRONTO, StatusPedido.CANCELADO},
+    StatusPedido.PRONTO: {StatusPedido.ENTREGUE, StatusPedido.CANCELADO},
+    StatusPedido.ENTREGUE: set(),
+    StatusPedido.CANCELADO: set(),
+}
+
+
 class Pedido(Base):
     __tablename__ = "pedidos"
 
     id = Column(Integer, primary_key=True, index=True)
     cliente = Column(String, nullable=False, index=True)
+    # Nome sem acentos e em minúsculas, mantido pelo banco (índice trigram)
+    cliente_busca = Column(String, Computed(normalizar_sql("cliente"), persisted=True))
     status = Column(SQLEnum(StatusPedido), default=StatusPedido.NOVO, nullable=False, index=True)
     data_entrega = Column(Date, nullable=False, index=True)
     horario = Column(Time)
     local = Column(String)
     observacoes = Column(Text)
     preco_total = Column(Numeric(10, 2))
+    # Ingredientes da ficha técnica já baixados do estoque (entrada em produção)
+    estoque_baixado = Column(Boolean, nullable=False, default=False, server_default="false")
     
     itens = relationship("ItemPedido", back_populates="pedido", cascade="all, delete-orphan")
     agenda = relationship("AgendaEntrega", back_populates="pedido", uselist=False, cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index(
+            "ix_pedidos_cliente_busca_trgm",
+            "cliente_busca",
+            postgresql_using="gin",
+            postgresql_ops={"cliente_busca": "gin_trgm_ops"},
+        ),
+    )
 
 
 class ItemPedido(Base):
     __tablename__ = "itens_pedido"
 
     id = Column(Integer, primary_key=True, index=True)
-    pedido_id = Column(Integer, ForeignKey("pedidos.id"), nullable=False)
+    pedido_id = Column(Integer, ForeignKey("pedidos.id"), nullable=False, index=True)
     receita_id = Column(Integer, ForeignKey("receitas.id"), nullable=False)
     quantidade = Column(Integer, nullable=False, default=1)
     unidade = Column(String)  # g, kg, un - opcional para personalização
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Numeric
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Numeric, Computed
 from sqlalchemy.orm import relationship
 from app.db.database import Base
+from app.services.unidades import fator_base_sql, unidade_base_sql
 
 
 class Receita(Base):
@@ -11,6 +12,7 @@ class Receita(Base):
     descricao = Column(Text)
     tempo_preparo = Column(Integer)  # minutos
     rendimento = Column(String)  # ex: "2 unidades", "500g"
+    custo = Column(Numeric(12, 4))  # materializado: soma das linhas x custo unitário
     
     ingredientes = relationship("IngredienteReceita", back_populates="receita", cascade="all, delete-orphan")
 
@@ -19,10 +21,16 @@ class IngredienteReceita(Base):
     __tablename__ = "ingrediente_receita"
 
     id = Column(Integer, primary_key=True, index=True)
-    receita_id = Column(Integer, ForeignKey("receitas.id"), nullable=False)
+    receita_id = Column(Integer, ForeignKey("receitas.id"), nullable=False, index=True)
     ingrediente_id = Column(Integer, ForeignKey("ingredientes.id"), nullable=False)
     quantidade = Column(Numeric(10, 2), nullable=False)
     unidade = Column(String, nullable=False)  # g, kg, ml, l, un
+    # Quantidade na unidade base (g, ml, un), mantida pelo banco
+    quantidade_base = Column(
+        Numeric(14, 4),
+        Computed(f"quantidade * ({fator_base_sql('unidade')})", persisted=True),
+    )
+    unidade_base = Column(String, Computed(unidade_base_sql("unidade"), persisted=True))
     
     receita = relationship("Receita", back_populates="ingredientes")
     ingrediente = relationship("Ingrediente")
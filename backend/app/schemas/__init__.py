@@ -3,6 +3,12 @@ from app.schemas.pedido import (
     PedidoUpdate,
     PedidoResponse,
     PedidoStatusUpdate,
+    PedidoStatusLoteUpdate,
+    PedidoStatusLoteResponse,
+    BaixaPendenteResponse,
+    PedidoBulkResultado,
+    PedidoBulkResponse,
+    ClienteBuscaResponse,
     ItemPedidoCreate,
     ItemPedidoResponse,
 )
@@ -10,6 +16,8 @@ from app.schemas.receita import (
     ReceitaCreate,
     ReceitaUpdate,
     ReceitaResponse,
+    ReceitaAtualizadaResponse,
+    AlteracoesIngredientes,
     IngredienteReceitaCreate,
     IngredienteReceitaResponse,
 )
@@ -17,13 +25,24 @@ from app.schemas.estoque import (
     EstoqueResponse,
     MovimentacaoEstoqueCreate,
     MovimentacaoEstoqueResponse,
+    MovimentacaoEstoqueLoteResponse,
+    PosicaoEstoqueResponse,
+    SnapshotEstoqueResponse,
+    ValorEstoqueItemResponse,
+    ValorEstoqueResponse,
 )
 from app.schemas.agenda import (
     AgendaEntregaCreate,
     AgendaEntregaUpdate,
     AgendaEntregaResponse,
+    PedidoResumoResponse,
 )
 from app.schemas.ingrediente import IngredienteCreate, IngredienteResponse
 from app.schemas.chat import ChatMessage, ChatResponse
 from app.schemas.stats import StatsResponse
-
+from app.schemas.metrics import MetricasPoolResponse, MetricasDbResponse
+from app.schemas.planejamento import (
+    ListaComprasResponse,
+    ItemListaComprasResponse,
+    PeriodoResponse,
+)
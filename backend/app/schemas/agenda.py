@@ -1,6 +1,9 @@
 from pydantic import BaseModel
-from typing import Optional
-from datetime import datetime
+from typing import List, Optional
+from datetime import datetime, date, time
+from decimal import Decimal
+from app.models.pedido import StatusPedido
+from app.schemas.pedido import ItemPedidoResponse
 
 
 class AgendaEntregaCreate(BaseModel):
@@ -16,6 +19,16 @@ class AgendaEntregaUpdate(BaseModel):
     responsavel: Optional[str] = None
 
 
+class PedidoResumoResponse(BaseModel):
+    id: int
+    cliente: str
+    status: StatusPedido
+    data_entrega: date
+    horario: Optional[time] = None
+    preco_total: Optional[Decimal] = None
+    itens: Optional[List[ItemPedidoResponse]] = None  # só com incluir_itens=true
+
+
 class AgendaEntregaResponse(BaseModel):
     id: int
     pedido_id: int
@@ -23,6 +36,7 @@ class AgendaEntregaResponse(BaseModel):
     local: Optional[str]
     responsavel: Optional[str]
     pedido_cliente: Optional[str] = None
+    pedido: Optional[PedidoResumoResponse] = None
 
     class Config:
         from_attributes = True
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 from decimal import Decimal
 from datetime import date
 from app.models.estoque import TipoMovimentacao
@@ -33,7 +33,42 @@ class MovimentacaoEstoqueResponse(BaseModel):
     quantidade: Decimal
     motivo: Optional[str]
     data: date
+    saldo_atual: Optional[Decimal] = None  # saldo após a movimentação, quando registrada
 
     class Config:
         from_attributes = True
 
+
+class MovimentacaoEstoqueLoteResponse(BaseModel):
+    registradas: int
+    movimentacoes: List[MovimentacaoEstoqueResponse]
+    saldos: Dict[int, Decimal]  # saldo final por ingrediente_id
+
+
+class PosicaoEstoqueResponse(BaseModel):
+    ingrediente_id: int
+    ingrediente_nome: Optional[str] = None
+    unidade_padrao: Optional[str] = None
+    data: date
+    quantidade: Decimal
+    snapshot_data: Optional[date] = None  # snapshot usado como ponto de partida
+
+
+class SnapshotEstoqueResponse(BaseModel):
+    data: date
+    ingredientes: int
+
+
+class ValorEstoqueItemResponse(BaseModel):
+    ingrediente_id: int
+    ingrediente_nome: Optional[str] = None
+    quantidade: Decimal
+    custo_unitario: Optional[Decimal] = None
+    valor: Optional[Decimal] = None  # None quando o ingrediente não tem custo
+
+
+class ValorEstoqueResponse(BaseModel):
+    data: Optional[date] = None  # None = posição atual
+    total: Decimal
+    sem_custo: int  # ingredientes com saldo mas sem custo unitário
+    ingredientes: List[ValorEstoqueItemResponse]
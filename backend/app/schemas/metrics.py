@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class MetricasPoolResponse(BaseModel):
+    pool_size: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    espera_total_ms: float
+    espera_media_ms: float
+    espera_max_ms: float
+
+
+class MetricasDbResponse(BaseModel):
+    sincrono: MetricasPoolResponse
+    assincrono: Optional[MetricasPoolResponse] = None
@@ -44,6 +44,14 @@ class PedidoUpdate(BaseModel):
     preco_total: Optional[Decimal] = None
 
 
+class BaixaPendenteResponse(BaseModel):
+    pedido_id: int
+    ingrediente_id: int
+    ingrediente_nome: str
+    unidade_receita: str
+    unidade_estoque: str
+
+
 class PedidoResponse(BaseModel):
     id: int
     cliente: str
@@ -54,11 +62,46 @@ class PedidoResponse(BaseModel):
     observacoes: Optional[str]
     preco_total: Optional[Decimal]
     itens: List[ItemPedidoResponse]
+    # Ingredientes sem baixa automática ao entrar em produção (lançar à mão)
+    baixa_pendente: Optional[List[BaixaPendenteResponse]] = None
 
     class Config:
         from_attributes = True
 
 
+class ClienteBuscaResponse(BaseModel):
+    cliente: str
+    similaridade: float
+    total_pedidos: int
+    ultimo_pedido: date
+
+
 class PedidoStatusUpdate(BaseModel):
     status: StatusPedido
 
+
+class PedidoStatusLoteUpdate(BaseModel):
+    status: StatusPedido
+    ids: Optional[List[int]] = None
+    data_entrega: Optional[date] = None
+    status_atual: Optional[StatusPedido] = None
+
+
+class PedidoStatusLoteResponse(BaseModel):
+    status: StatusPedido
+    atualizados: List[int]
+    ignorados: List[int]
+    baixa_pendente: List[BaixaPendenteResponse] = []
+
+
+
+class PedidoBulkResultado(BaseModel):
+    indice: int
+    pedido: Optional[PedidoResponse] = None
+    erro: Optional[str] = None
+
+
+class PedidoBulkResponse(BaseModel):
+    criados: int
+    erros: int
+    resultados: List[PedidoBulkResultado]
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import List
+from decimal import Decimal
+from datetime import date
+
+
+class PeriodoResponse(BaseModel):
+    inicio: date
+    fim: date
+
+
+class ItemListaComprasResponse(BaseModel):
+    ingrediente_id: int
+    ingrediente: str
+    quantidade_necessaria: Decimal
+    quantidade_atual: Decimal
+    quantidade_comprar: Decimal
+    unidade: str  # unidade base: g, ml, un
+
+
+class ListaComprasResponse(BaseModel):
+    periodo: PeriodoResponse
+    lista_compras: List[ItemListaComprasResponse]
@@ -36,14 +36,24 @@ class ReceitaUpdate(BaseModel):
     ingredientes: Optional[List[IngredienteReceitaCreate]] = None
 
 
+class AlteracoesIngredientes(BaseModel):
+    inseridos: List[int]
+    atualizados: List[int]
+    removidos: List[int]
+
+
 class ReceitaResponse(BaseModel):
     id: int
     nome: str
     descricao: Optional[str]
     tempo_preparo: Optional[int]
     rendimento: Optional[str]
+    custo: Optional[Decimal] = None
     ingredientes: List[IngredienteReceitaResponse]
 
     class Config:
         from_attributes = True
 
+
+class ReceitaAtualizadaResponse(ReceitaResponse):
+    alteracoes: Optional[AlteracoesIngredientes] = None
@@ -0,0 +1,33 @@
+"""Serviços de normalização de texto para busca"""
+
+import re
+from typing import List
+
+# Mapa de acentos usado tanto em Python quanto no SQL (translate), para que
+# o termo buscado e as colunas normalizadas no banco sejam comparáveis.
+ACENTOS = "áàâãäéèêëíìîïóòôõöúùûüçñÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑ"
+SEM_ACENTOS = "aaaaaeeeeiiiiooooouuuucnaaaaaeeeeiiiiooooouuuucn"
+
+_TABELA = str.maketrans(ACENTOS, SEM_ACENTOS)
+
+# Palavras ignoradas na tokenização ("bolo de cenoura" -> bolo, cenoura)
+STOPWORDS = {"a", "o", "as", "os", "e", "de", "da", "do", "das", "dos", "com", "sem", "em", "no", "na"}
+
+
+def normalizar(texto: str) -> str:
+    """Remove acentos e converte para minúsculas"""
+    return texto.lower().translate(_TABELA).strip()
+
+
+def tokens(texto: str) -> List[str]:
+    """Palavras normalizadas do texto, sem stopwords"""
+    return [t for t in re.findall(r"[a-z0-9]+", normalizar(texto)) if t not in STOPWORDS]
+
+
+def normalizar_sql(coluna: str) -> str:
+    """Expressão SQL equivalente a normalizar() para uma coluna
+
+    pedidos.cliente_busca foi criada com esta expressão congelada na migração
+    002; ao alterá-la, crie uma nova migração que recrie a coluna.
+    """
+    return f"translate(lower({coluna}), '{ACENTOS}', '{SEM_ACENTOS}')"
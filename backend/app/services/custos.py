@@ -0,0 +1,69 @@
+"""Serviços de custo materializado das receitas (ficha técnica)"""
+
+from typing import Iterable
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+from app.models.receita import Receita, IngredienteReceita
+from app.models.estoque import Estoque
+from app.models.ingrediente import Ingrediente
+
+
+def _custo_linha():
+    """Custo de uma linha na unidade padrão do ingrediente; NULL se incompatível"""
+    return case(
+        (
+            IngredienteReceita.unidade_base == Ingrediente.unidade_base,
+            IngredienteReceita.quantidade_base / Ingrediente.fator_base * Estoque.custo_unitario,
+        ),
+        else_=None,
+    )
+
+
+def _custo_receita():
+    """Soma o custo das linhas; NULL se alguma linha não tem custo ou unidade compatível"""
+    custo_linha = _custo_linha()
+    return (
+        select(
+            case(
+                (
+                    func.count(custo_linha) == func.count(),
+                    func.coalesce(func.sum(custo_linha), 0),
+                ),
+                else_=None,
+            )
+        )
+        .select_from(IngredienteReceita)
+        .join(Ingrediente, Ingrediente.id == IngredienteReceita.ingrediente_id)
+        .outerjoin(Estoque, Estoque.ingrediente_id == IngredienteReceita.ingrediente_id)
+        .where(IngredienteReceita.receita_id == Receita.id)
+        .scalar_subquery()
+    )
+
+
+def recalcular_custos_receitas(db: Session, receita_ids: Iterable[int]) -> None:
+    """Recalcula o custo das receitas indicadas com um único UPDATE"""
+    receita_ids = list(receita_ids)
+    if not receita_ids:
+        return
+    db.execute(
+        update(Receita)
+        .where(Receita.id.in_(receita_ids))
+        .values(custo=_custo_receita())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def recalcular_custos_por_ingredientes(db: Session, ingrediente_ids: Iterable[int]) -> None:
+    """Recalcula o custo das receitas que usam os ingredientes indicados"""
+    ingrediente_ids = list(ingrediente_ids)
+    if not ingrediente_ids:
+        return
+    receitas_afetadas = select(IngredienteReceita.receita_id).where(
+        IngredienteReceita.ingrediente_id.in_(ingrediente_ids)
+    )
+    db.execute(
+        update(Receita)
+        .where(Receita.id.in_(receitas_afetadas))
+        .values(custo=_custo_receita())
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,184 @@
+"""Aplicação atômica de movimentações ao saldo de estoque"""
+
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy import Boolean, Integer, case, cast, literal, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models.estoque import Estoque, TipoMovimentacao
+
+
+def _saldo_inicial(tipo: TipoMovimentacao, quantidade: Decimal) -> Decimal:
+    """Saldo de um ingrediente ainda sem registro de estoque"""
+    return Decimal("0") if tipo == TipoMovimentacao.SAIDA else quantidade
+
+
+def _novo_saldo(tipo: TipoMovimentacao, quantidade: Decimal):
+    """Expressão do saldo após a movimentação; saídas nunca deixam o saldo negativo"""
+    atual = Estoque.quantidade_atual
+    if tipo == TipoMovimentacao.ENTRADA:
+        return atual + quantidade
+    if tipo == TipoMovimentacao.SAIDA:
+        return case((atual < quantidade, 0), else_=atual - quantidade)
+    return literal(quantidade, atual.type)  # AJUSTE
+
+
+def aplicar_movimentacao(
+    db: Session, ingrediente_id: int, tipo: TipoMovimentacao, quantidade: Decimal
+) -> Decimal:
+    """Aplica a movimentação no banco (upsert com RETURNING) e devolve o novo saldo
+
+    O cálculo acontece no próprio UPDATE, então movimentações concorrentes do
+    mesmo ingrediente não perdem atualizações nem precisam de lock explícito.
+    """
+    stmt = pg_insert(Estoque).values(
+        ingrediente_id=ingrediente_id,
+        quantidade_atual=_saldo_inicial(tipo, quantidade),
+        ponto_reposicao=Decimal("0"),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Estoque.ingrediente_id],
+        set_={"quantidade_atual": _novo_saldo(tipo, quantidade)},
+    ).returning(Estoque.quantidade_atual)
+    return db.execute(stmt).scalar_one()
+
+
+class Transformacao(NamedTuple):
+    """Efeito de uma sequência de movimentações: max(base + delta, piso)
+
+    base é o saldo atual (relativo) ou zero (após um ajuste); piso None = sem piso.
+    """
+
+    relativo: bool
+    delta: Decimal
+    piso: Optional[Decimal]
+
+    @classmethod
+    def de(cls, tipo: TipoMovimentacao, quantidade: Decimal) -> "Transformacao":
+        if tipo == TipoMovimentacao.ENTRADA:
+            return cls(True, quantidade, None)
+        if tipo == TipoMovimentacao.SAIDA:
+            return cls(True, -quantidade, Decimal("0"))
+        return cls(False, quantidade, None)  # AJUSTE
+
+    def aplicar(self, saldo: Decimal) -> Decimal:
+        """Saldo resultante a partir de um saldo inicial"""
+        resultado = (saldo if self.relativo else Decimal("0")) + self.delta
+        return max(resultado, self.piso) if self.piso is not None else resultado
+
+    def seguida_de(self, outra: "Transformacao") -> "Transformacao":
+        """Composição: aplicar self e depois outra"""
+        if not outra.relativo:
+            return outra
+        pisos = [outra.piso] if outra.piso is not None else []
+        if self.piso is not None:
+            pisos.append(self.piso + outra.delta)
+        return Transformacao(self.relativo, self.delta + outra.delta, max(pisos) if pisos else None)
+
+
+def _garantir_registros(db: Session, ingrediente_ids: Iterable[int]) -> None:
+    """Cria com saldo zero os registros de estoque ainda ausentes"""
+    db.execute(
+        pg_insert(Estoque)
+        .values(
+            [
+                {
+                    "ingrediente_id": ingrediente_id,
+                    "quantidade_atual": Decimal("0"),
+                    "ponto_reposicao": Decimal("0"),
+                }
+                for ingrediente_id in ingrediente_ids
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=[Estoque.ingrediente_id])
+    )
+
+
+def travar_saldos(db: Session, ingrediente_ids: Iterable[int]) -> Dict[int, Decimal]:
+    """Trava (FOR UPDATE) os registros de estoque e devolve o saldo atual de cada ingrediente
+
+    Os registros são travados em ordem de ingrediente_id, a mesma usada por
+    aplicar_movimentacoes, para que escritas concorrentes não entrem em deadlock.
+    Até o fim da transação nenhuma outra movimentação altera esses saldos, então
+    eles servem de ponto de partida para calcular o que cada movimentação
+    efetivamente mudou (ver quantidades_efetivas).
+    """
+    ids = sorted(set(ingrediente_ids))
+    if not ids:
+        return {}
+    _garantir_registros(db, ids)
+    rows = db.execute(
+        select(Estoque.ingrediente_id, Estoque.quantidade_atual)
+        .where(Estoque.ingrediente_id.in_(ids))
+        .order_by(Estoque.ingrediente_id)
+        .with_for_update()
+    ).all()
+    return {row.ingrediente_id: row.quantidade_atual for row in rows}
+
+
+def quantidades_efetivas(
+    saldos: Dict[int, Decimal],
+    movimentacoes: Sequence[Tuple[int, TipoMovimentacao, Decimal]],
+) -> List[Decimal]:
+    """Variação real do saldo causada por cada movimentação, aplicadas na ordem dada
+
+    Difere da quantidade pedida quando uma saída esbarra no piso zero.
+    """
+    saldos = dict(saldos)
+    efetivas = []
+    for ingrediente_id, tipo, quantidade in movimentacoes:
+        antes = saldos.get(ingrediente_id, Decimal("0"))
+        depois = Transformacao.de(tipo, quantidade).aplicar(antes)
+        saldos[ingrediente_id] = depois
+        efetivas.append(abs(depois - antes))
+    return efetivas
+
+
+def aplicar_movimentacoes(
+    db: Session, movimentacoes: Iterable[Tuple[int, TipoMovimentacao, Decimal]]
+) -> Dict[int, Decimal]:
+    """Aplica várias movimentações (na ordem dada) e devolve o saldo final por ingrediente
+
+    As movimentações são compostas por ingrediente em Python e aplicadas com
+    três comandos: um insert multi-linha dos registros de estoque ausentes, o
+    SELECT ... FOR UPDATE ordenado que os trava e um UPDATE ... FROM efeitos
+    RETURNING com o efeito de cada ingrediente.
+    """
+    efeitos: Dict[int, Transformacao] = {}
+    for ingrediente_id, tipo, quantidade in movimentacoes:
+        efeito = Transformacao.de(tipo, quantidade)
+        anterior = efeitos.get(ingrediente_id)
+        efeitos[ingrediente_id] = anterior.seguida_de(efeito) if anterior else efeito
+    if not efeitos:
+        return {}
+
+    # Trava os registros em ordem de ingrediente_id antes do UPDATE, cuja ordem de
+    # visita depende do plano: todo escritor trava na mesma ordem, sem deadlock
+    travar_saldos(db, efeitos)
+
+    # Uma linha por ingrediente com o efeito composto; tipos explícitos porque
+    # parâmetros sem contexto não têm tipo inferido pelo banco
+    numerico = Estoque.quantidade_atual.type
+    v = union_all(
+        *(
+            select(
+                literal(ingrediente_id, Integer).label("ingrediente_id"),
+                literal(efeito.relativo, Boolean).label("relativo"),
+                literal(efeito.delta, numerico).label("delta"),
+                literal(efeito.piso, numerico).label("piso"),
+            )
+            for ingrediente_id, efeito in efeitos.items()
+        )
+    ).cte("efeitos")
+    relativo = cast(v.c.relativo, Boolean)
+    piso = cast(v.c.piso, numerico)
+    saldo = case((relativo, Estoque.quantidade_atual), else_=0) + cast(v.c.delta, numerico)
+    novo_saldo = case((piso.isnot(None) & (saldo < piso), piso), else_=saldo)
+    rows = db.execute(
+        update(Estoque)
+        .where(Estoque.ingrediente_id == cast(v.c.ingrediente_id, Integer))
+        .values(quantidade_atual=novo_saldo)
+        .returning(Estoque.ingrediente_id, Estoque.quantidade_atual)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return {row.ingrediente_id: row.quantidade_atual for row in rows}
@@ -0,0 +1,95 @@
+"""Serviços de paginação por cursor (keyset) e de exportação em streaming"""
+
+import csv
+import io
+from datetime import date
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+from sqlalchemy.engine import Result
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Linhas buscadas por ida ao banco (cursor no servidor) e por bloco enviado
+EXPORT_YIELD_PER = 1000
+
+
+def encode_cursor(data: date, item_id: int) -> str:
+    """Codifica a chave (data, id) do último item da página"""
+    return f"{data.isoformat()}_{item_id}"
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[date, int]]:
+    """Decodifica um cursor no formato 'AAAA-MM-DD_id'"""
+    try:
+        data_str, id_str = cursor.split("_", 1)
+        return date.fromisoformat(data_str), int(id_str)
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def ordenar_por_cursor(stmt: Any, cursor: Optional[str], coluna_data: Any, coluna_id: Any) -> Any:
+    """Ordena por (data, id) decrescente a partir da chave do cursor (400 se inválido)
+
+    Serve tanto para select() quanto para Query; a ordem é a mesma da chave,
+    então o índice em (data, id) atende filtro e ordenação.
+    """
+    if cursor:
+        chave = decode_cursor(cursor)
+        if not chave:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        stmt = stmt.filter(tuple_(coluna_data, coluna_id) < chave)
+    return stmt.order_by(coluna_data.desc(), coluna_id.desc())
+
+
+def cortar_pagina(
+    linhas: List[Any],
+    limit: int,
+    response: Response,
+    chave: Callable[[Any], Tuple[date, int]],
+) -> List[Any]:
+    """Recebe limit + 1 linhas; se houver mais, corta e publica o cursor da próxima página"""
+    if len(linhas) > limit:
+        linhas = linhas[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*chave(linhas[-1]))
+    return linhas
+
+
+def executar_em_streaming(stmt: Any) -> Iterator[Any]:
+    """Executa a consulta com cursor no servidor e devolve um iterador das linhas
+
+    A consulta roda já na chamada, antes da StreamingResponse: falhas de
+    conexão ou de SQL viram um 500 em vez de um 200 com arquivo vazio. A
+    sessão é própria porque as linhas são lidas depois que as dependências
+    do request já fecharam; o iterador a fecha ao terminar.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_YIELD_PER))
+    except Exception:
+        db.close()
+        raise
+    return _ler(db, result)
+
+
+def _ler(db: Session, result: Result) -> Iterator[Any]:
+    try:
+        yield from result
+    finally:
+        db.close()
+
+
+def csv_em_blocos(cabecalho: Sequence[str], linhas: Iterable[Sequence[Any]]) -> Iterator[str]:
+    """Gera o CSV em blocos de EXPORT_YIELD_PER linhas, sem materializar o arquivo"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(cabecalho)
+    for n, linha in enumerate(linhas, start=1):
+        writer.writerow(linha)
+        if n % EXPORT_YIELD_PER == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
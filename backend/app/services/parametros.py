@@ -0,0 +1,16 @@
+"""Leitura de parâmetros de consulta compostos"""
+
+from typing import List, Optional
+
+MAX_IDS = 500
+
+
+def decode_ids(valor: str) -> Optional[List[int]]:
+    """Decodifica uma lista 'id1,id2,...' sem repetições; None se inválida"""
+    try:
+        ids = list(dict.fromkeys(int(parte) for parte in valor.split(",") if parte.strip()))
+    except ValueError:
+        return None
+    if not ids or len(ids) > MAX_IDS:
+        return None
+    return ids
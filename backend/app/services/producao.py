@@ -0,0 +1,202 @@
+"""Baixa de estoque pela ficha técnica quando pedidos entram em produção"""
+
+import logging
+from datetime import date
+from decimal import ROUND_CEILING, Decimal
+from typing import Iterable, List, NamedTuple, Tuple
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.orm import Session
+from app.models.pedido import Pedido, ItemPedido, StatusPedido
+from app.models.receita import IngredienteReceita
+from app.models.ingrediente import Ingrediente
+from app.models.estoque import Estoque, MovimentacaoEstoque, TipoMovimentacao
+from app.services.movimentacoes import (
+    aplicar_movimentacoes,
+    quantidades_efetivas,
+    travar_saldos,
+)
+
+logger = logging.getLogger(__name__)
+
+# Status que movimentam estoque: entrada em produção baixa, cancelamento estorna
+STATUS_COM_ESTOQUE = {StatusPedido.EM_PRODUCAO, StatusPedido.CANCELADO}
+
+# Menor quantidade representável no saldo (numeric de quantidade_atual)
+PASSO_SALDO = Decimal(1).scaleb(-Estoque.quantidade_atual.type.scale)
+
+
+class BaixaPendente(NamedTuple):
+    """Linha da ficha técnica sem conversão para a unidade do estoque; baixa manual"""
+
+    pedido_id: int
+    ingrediente_id: int
+    ingrediente_nome: str
+    unidade_receita: str
+    unidade_estoque: str
+
+
+class BaixaEstoque(NamedTuple):
+    alterado: bool
+    pendentes: List[BaixaPendente]
+
+
+def _marcar(
+    db: Session, pedido_ids: List[int], status: StatusPedido, baixado: bool
+) -> List[int]:
+    """Inverte estoque_baixado dos pedidos no status; o lock da linha evita baixa dupla"""
+    return db.scalars(
+        update(Pedido)
+        .where(
+            Pedido.id.in_(pedido_ids),
+            Pedido.status == status,
+            Pedido.estoque_baixado.is_(not baixado),
+        )
+        .values(estoque_baixado=baixado)
+        .returning(Pedido.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+
+def _consumo(db: Session, pedido_ids: List[int]) -> List[Tuple[int, int, Decimal]]:
+    """(pedido, ingrediente, quantidade na unidade padrão) pela ficha técnica das receitas
+
+    A quantidade é arredondada para cima na precisão do saldo: 3 g de um
+    ingrediente estocado em kg baixam 0.01, nunca zero.
+    """
+    # Linhas com unidade incompatível com a do ingrediente não têm conversão e ficam de fora
+    quantidade = func.sum(
+        ItemPedido.quantidade * IngredienteReceita.quantidade_base / Ingrediente.fator_base
+    )
+    rows = db.execute(
+        select(ItemPedido.pedido_id, IngredienteReceita.ingrediente_id, quantidade)
+        .join(IngredienteReceita, IngredienteReceita.receita_id == ItemPedido.receita_id)
+        .join(Ingrediente, Ingrediente.id == IngredienteReceita.ingrediente_id)
+        .where(
+            ItemPedido.pedido_id.in_(pedido_ids),
+            IngredienteReceita.unidade_base == Ingrediente.unidade_base,
+        )
+        .group_by(ItemPedido.pedido_id, IngredienteReceita.ingrediente_id)
+        .order_by(ItemPedido.pedido_id, IngredienteReceita.ingrediente_id)
+    ).all()
+    return [
+        (pedido_id, ingrediente_id, Decimal(quantidade).quantize(PASSO_SALDO, ROUND_CEILING))
+        for pedido_id, ingrediente_id, quantidade in rows
+    ]
+
+
+def _sem_conversao(db: Session, pedido_ids: List[int]) -> List[BaixaPendente]:
+    """Linhas que _consumo deixa de fora por unidade incompatível com a do ingrediente"""
+    rows = db.execute(
+        select(
+            ItemPedido.pedido_id,
+            IngredienteReceita.ingrediente_id,
+            Ingrediente.nome,
+            IngredienteReceita.unidade,
+            Ingrediente.unidade_padrao,
+        )
+        .distinct()
+        .join(IngredienteReceita, IngredienteReceita.receita_id == ItemPedido.receita_id)
+        .join(Ingrediente, Ingrediente.id == IngredienteReceita.ingrediente_id)
+        .where(
+            ItemPedido.pedido_id.in_(pedido_ids),
+            IngredienteReceita.unidade_base != Ingrediente.unidade_base,
+        )
+        .order_by(ItemPedido.pedido_id, IngredienteReceita.ingrediente_id)
+    ).all()
+    return [BaixaPendente(*row) for row in rows]
+
+
+def _consumido(db: Session, pedido_ids: List[int]) -> List[Tuple[int, int, Decimal]]:
+    """Saldo líquido baixado por pedido e ingrediente, segundo o livro de movimentações
+
+    O livro registra o quanto cada baixa realmente tirou do saldo (ver
+    sincronizar_estoque_pedidos), então o estorno nunca devolve mais do que saiu.
+    """
+    liquido = func.sum(
+        case(
+            (
+                MovimentacaoEstoque.tipo == TipoMovimentacao.SAIDA,
+                MovimentacaoEstoque.quantidade,
+            ),
+            else_=-MovimentacaoEstoque.quantidade,
+        )
+    )
+    rows = db.execute(
+        select(MovimentacaoEstoque.pedido_id, MovimentacaoEstoque.ingrediente_id, liquido)
+        .where(MovimentacaoEstoque.pedido_id.in_(pedido_ids))
+        .group_by(MovimentacaoEstoque.pedido_id, MovimentacaoEstoque.ingrediente_id)
+        .having(liquido > 0)
+        .order_by(MovimentacaoEstoque.pedido_id, MovimentacaoEstoque.ingrediente_id)
+    ).all()
+    return [tuple(row) for row in rows]
+
+
+def sincronizar_estoque_pedidos(db: Session, pedido_ids: Iterable[int]) -> BaixaEstoque:
+    """Baixa o estoque dos pedidos que entraram em produção e estorna os cancelados
+
+    Tudo na transação corrente: a ficha técnica é explodida em uma consulta,
+    o saldo de cada ingrediente é atualizado em um único UPDATE e o livro
+    recebe uma linha por pedido e ingrediente com a quantidade efetivamente
+    baixada (menor que a da receita quando o saldo zera). Devolve se o estoque
+    mudou e as linhas da ficha que ficaram sem baixa por falta de conversão
+    de unidade, para serem lançadas à mão.
+    """
+    pedido_ids = list(pedido_ids)
+    pendentes: List[BaixaPendente] = []
+    if not pedido_ids:
+        return BaixaEstoque(False, pendentes)
+
+    # (pedido, ingrediente, tipo, quantidade, motivo)
+    movimentos = []
+    em_producao = _marcar(db, pedido_ids, StatusPedido.EM_PRODUCAO, True)
+    if em_producao:
+        movimentos += [
+            (pedido_id, ingrediente_id, TipoMovimentacao.SAIDA, quantidade, "Produção")
+            for pedido_id, ingrediente_id, quantidade in _consumo(db, em_producao)
+            if quantidade > 0
+        ]
+        pendentes = _sem_conversao(db, em_producao)
+        for pendente in pendentes:
+            logger.warning(
+                "Pedido #%s: %s em '%s' na receita e '%s' no estoque, sem baixa automática",
+                pendente.pedido_id,
+                pendente.ingrediente_nome,
+                pendente.unidade_receita,
+                pendente.unidade_estoque,
+            )
+    cancelados = _marcar(db, pedido_ids, StatusPedido.CANCELADO, False)
+    if cancelados:
+        movimentos += [
+            (pedido_id, ingrediente_id, TipoMovimentacao.ENTRADA, quantidade, "Estorno")
+            for pedido_id, ingrediente_id, quantidade in _consumido(db, cancelados)
+        ]
+    if not movimentos:
+        return BaixaEstoque(False, pendentes)
+
+    aplicacao = [
+        (ingrediente_id, tipo, quantidade)
+        for _, ingrediente_id, tipo, quantidade, _ in movimentos
+    ]
+    # Saldos travados antes do UPDATE: com eles se sabe quanto cada saída tirou de fato
+    saldos = travar_saldos(db, {ingrediente_id for ingrediente_id, _, _ in aplicacao})
+    efetivas = quantidades_efetivas(saldos, aplicacao)
+    aplicar_movimentacoes(db, aplicacao)
+    hoje = date.today()
+    db.execute(
+        insert(MovimentacaoEstoque),
+        [
+            {
+                "ingrediente_id": ingrediente_id,
+                "pedido_id": pedido_id,
+                "tipo": tipo,
+                "quantidade": efetiva,
+                "motivo": f"{motivo} do pedido #{pedido_id}"
+                + (f" (faltaram {quantidade - efetiva})" if efetiva < quantidade else ""),
+                "data": hoje,
+            }
+            for (pedido_id, ingrediente_id, tipo, quantidade, motivo), efetiva in zip(
+                movimentos, efetivas
+            )
+        ],
+    )
+    return BaixaEstoque(True, pendentes)
@@ -0,0 +1,131 @@
+"""Cache em processo do catálogo de receitas"""
+
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy.orm import Session, selectinload
+from app.models.receita import Receita, IngredienteReceita
+from app.services.busca import normalizar, tokens
+from app.schemas.receita import ReceitaResponse, IngredienteReceitaResponse
+
+
+class _Catalogo(NamedTuple):
+    """Uma leitura completa do catálogo; os três mapas são sempre da mesma carga"""
+
+    receitas: Dict[int, ReceitaResponse]
+    nomes: Dict[int, str]
+    # Pares (token, receita_id) ordenados, para busca por prefixo com bisect
+    indice: List[Tuple[str, int]]
+
+
+class CatalogoReceitas:
+    """Receitas, linhas e nomes de ingredientes, invalidado pelas escritas em /api/receitas"""
+
+    def __init__(self):
+        self._catalogo: Optional[_Catalogo] = None
+        self._geracao = 0
+        self._lock = threading.Lock()
+
+    def receitas(self, db: Session) -> Dict[int, ReceitaResponse]:
+        """Todas as receitas por id, carregando o catálogo se necessário"""
+        return self._obter(db).receitas
+
+    def nomes(self, db: Session, receita_ids: Iterable[int] = ()) -> Dict[int, str]:
+        """Mapa receita_id -> nome, recarregado se faltar algum id"""
+        catalogo = self._catalogo
+        if catalogo is None or any(rid not in catalogo.nomes for rid in receita_ids):
+            catalogo = self._carregar(db)
+        return catalogo.nomes
+
+    def buscar(self, db: Session, termo: str, limite: int = 10) -> List[ReceitaResponse]:
+        """Receitas cujo nome contém as palavras do termo (por prefixo), mais relevantes primeiro"""
+        receitas, _, indice = self._obter(db)
+        palavras = set(tokens(termo))
+        encontrados: Dict[int, int] = defaultdict(int)
+        exatos: Dict[int, int] = defaultdict(int)
+        for palavra in palavras:
+            ids = set()
+            pos = bisect_left(indice, (palavra, -1))
+            while pos < len(indice) and indice[pos][0].startswith(palavra):
+                token, receita_id = indice[pos]
+                if receita_id not in ids:
+                    ids.add(receita_id)
+                    encontrados[receita_id] += 1
+                if token == palavra:
+                    exatos[receita_id] += 1
+                pos += 1
+
+        termo_normalizado = normalizar(termo)
+        ranking = sorted(
+            (rid for rid in encontrados if rid in receitas),
+            key=lambda rid: (
+                -encontrados[rid],
+                -exatos[rid],
+                not normalizar(receitas[rid].nome).startswith(termo_normalizado),
+                len(receitas[rid].nome),
+                rid,
+            ),
+        )
+        return [receitas[rid] for rid in ranking[:limite]]
+
+    def invalidar(self) -> None:
+        """Descarta o catálogo atual; a próxima leitura recarrega do banco"""
+        with self._lock:
+            self._geracao += 1
+            self._catalogo = None
+
+    def _obter(self, db: Session) -> _Catalogo:
+        catalogo = self._catalogo
+        if catalogo is None:
+            catalogo = self._carregar(db)
+        return catalogo
+
+    def _carregar(self, db: Session) -> _Catalogo:
+        """Lê o catálogo do banco; quem chamou usa o resultado mesmo se ele não for publicado"""
+        geracao = self._geracao
+        # Duas consultas: receitas e linhas (já com o nome do ingrediente)
+        rows = (
+            db.query(Receita)
+            .options(
+                selectinload(Receita.ingredientes).joinedload(IngredienteReceita.ingrediente)
+            )
+            .order_by(Receita.id)
+            .all()
+        )
+        receitas = {receita.id: _receita_response(receita) for receita in rows}
+        nomes = {receita_id: receita.nome for receita_id, receita in receitas.items()}
+        indice = sorted(
+            {(token, receita_id) for receita_id, nome in nomes.items() for token in tokens(nome)}
+        )
+        catalogo = _Catalogo(receitas, nomes, indice)
+        with self._lock:
+            # Não publica um catálogo lido antes de uma invalidação concorrente
+            if geracao == self._geracao:
+                self._catalogo = catalogo
+        return catalogo
+
+
+def _receita_response(receita: Receita) -> ReceitaResponse:
+    return ReceitaResponse(
+        id=receita.id,
+        nome=receita.nome,
+        descricao=receita.descricao,
+        tempo_preparo=receita.tempo_preparo,
+        rendimento=receita.rendimento,
+        custo=receita.custo,
+        ingredientes=[
+            IngredienteReceitaResponse(
+                id=ing_rec.id,
+                ingrediente_id=ing_rec.ingrediente_id,
+                quantidade=ing_rec.quantidade,
+                unidade=ing_rec.unidade,
+                ingrediente_nome=ing_rec.ingrediente.nome if ing_rec.ingrediente else None,
+            )
+            for ing_rec in receita.ingredientes
+        ],
+    )
+
+
+# Instância global do cache
+catalogo_receitas = CatalogoReceitas()
@@ -0,0 +1,166 @@
+"""Snapshots de estoque e posição do estoque em uma data"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import and_, delete, func, or_, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.models.estoque import MovimentacaoEstoque, SnapshotEstoque
+from app.services.movimentacoes import Transformacao
+
+
+# Chave do advisory lock que serializa a gravação de snapshots e as
+# movimentações retroativas que os invalidam
+LOCK_SNAPSHOTS = 210001
+
+
+def _travar_snapshots(db: Session) -> None:
+    """Advisory lock até o fim da transação (só PostgreSQL)"""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:chave)"), {"chave": LOCK_SNAPSHOTS})
+
+
+def _ultimos_snapshots(data: date, ingrediente_ids: Optional[Iterable[int]]):
+    """Data do snapshot mais recente até a data, por ingrediente"""
+    stmt = (
+        select(
+            SnapshotEstoque.ingrediente_id,
+            func.max(SnapshotEstoque.data).label("data"),
+        )
+        .where(SnapshotEstoque.data <= data)
+        .group_by(SnapshotEstoque.ingrediente_id)
+    )
+    if ingrediente_ids is not None:
+        stmt = stmt.where(SnapshotEstoque.ingrediente_id.in_(ingrediente_ids))
+    return stmt.subquery()
+
+
+def posicao_em(
+    db: Session, data: date, ingrediente_ids: Optional[Iterable[int]] = None
+) -> Dict[int, Tuple[Decimal, Optional[date]]]:
+    """Saldo ao fim do dia por ingrediente: snapshot anterior + movimentações desde ele
+
+    Devolve ingrediente_id -> (quantidade, data do snapshot usado). Ingredientes
+    sem snapshot nem movimentação até a data não aparecem (saldo zero).
+
+    As movimentações são reaplicadas em ordem de data, enquanto o saldo atual
+    as aplicou em ordem de registro. Ajustes retroativos são recusados pela API
+    por isso. Ainda assim, uma saída que esbarrou no piso zero seguida de uma
+    movimentação retroativa (registrada depois, com data anterior) pode fazer
+    a posição de hoje diferir de estoque.quantidade_atual.
+    """
+    if ingrediente_ids is not None:
+        ingrediente_ids = list(ingrediente_ids)
+    ultimos = _ultimos_snapshots(data, ingrediente_ids)
+
+    posicoes: Dict[int, Tuple[Decimal, Optional[date]]] = {
+        row.ingrediente_id: (row.quantidade, row.data)
+        for row in db.execute(
+            select(
+                SnapshotEstoque.ingrediente_id,
+                SnapshotEstoque.data,
+                SnapshotEstoque.quantidade,
+            ).join(
+                ultimos,
+                and_(
+                    ultimos.c.ingrediente_id == SnapshotEstoque.ingrediente_id,
+                    ultimos.c.data == SnapshotEstoque.data,
+                ),
+            )
+        )
+    }
+
+    # Só as movimentações posteriores ao snapshot de cada ingrediente
+    stmt = (
+        select(
+            MovimentacaoEstoque.ingrediente_id,
+            MovimentacaoEstoque.tipo,
+            MovimentacaoEstoque.quantidade,
+        )
+        .outerjoin(ultimos, ultimos.c.ingrediente_id == MovimentacaoEstoque.ingrediente_id)
+        .where(
+            MovimentacaoEstoque.data <= data,
+            or_(ultimos.c.data.is_(None), MovimentacaoEstoque.data > ultimos.c.data),
+        )
+        .order_by(
+            MovimentacaoEstoque.ingrediente_id,
+            MovimentacaoEstoque.data,
+            MovimentacaoEstoque.id,
+        )
+    )
+    if ingrediente_ids is not None:
+        stmt = stmt.where(MovimentacaoEstoque.ingrediente_id.in_(ingrediente_ids))
+
+    for row in db.execute(stmt):
+        saldo, snapshot = posicoes.get(row.ingrediente_id, (Decimal("0"), None))
+        saldo = Transformacao.de(row.tipo, row.quantidade).aplicar(saldo)
+        posicoes[row.ingrediente_id] = (saldo, snapshot)
+    return posicoes
+
+
+def gerar_snapshots(db: Session, data: date) -> int:
+    """Grava (ou regrava) o snapshot de todos os ingredientes ao fim da data
+
+    O lock é tomado antes de ler o livro: uma movimentação retroativa que
+    chegue no meio espera o commit e então apaga o snapshot que ficou velho.
+    """
+    _travar_snapshots(db)
+    posicoes = posicao_em(db, data)
+    if not posicoes:
+        return 0
+    stmt = pg_insert(SnapshotEstoque).values(
+        [
+            {"ingrediente_id": ingrediente_id, "data": data, "quantidade": quantidade}
+            for ingrediente_id, (quantidade, _) in posicoes.items()
+        ]
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[SnapshotEstoque.ingrediente_id, SnapshotEstoque.data],
+            set_={"quantidade": stmt.excluded.quantidade},
+        )
+    )
+    return len(posicoes)
+
+
+def gerar_snapshot_diario() -> int:
+    """Snapshot do dia anterior com sessão própria, para a tarefa periódica da API"""
+    db = SessionLocal()
+    try:
+        ingredientes = gerar_snapshots(db, date.today() - timedelta(days=1))
+        db.commit()
+        return ingredientes
+    finally:
+        db.close()
+
+
+def invalidar_snapshots(db: Session, movimentacoes: Iterable[Tuple[int, date]]) -> None:
+    """Remove snapshots que não refletem movimentações retroativas (ingrediente, data)
+
+    Snapshots só existem para dias já encerrados, então movimentações de hoje
+    em diante não custam nenhum comando extra.
+    """
+    hoje = date.today()
+    inicio: Dict[int, date] = {}
+    for ingrediente_id, data in movimentacoes:
+        if data < hoje and (ingrediente_id not in inicio or data < inicio[ingrediente_id]):
+            inicio[ingrediente_id] = data
+    if not inicio:
+        return
+    # Mesmo lock de gerar_snapshots, mantido até o commit da movimentação
+    _travar_snapshots(db)
+    db.execute(
+        delete(SnapshotEstoque).where(
+            or_(
+                *(
+                    and_(
+                        SnapshotEstoque.ingrediente_id == ingrediente_id,
+                        SnapshotEstoque.data >= data,
+                    )
+                    for ingrediente_id, data in inicio.items()
+                )
+            )
+        )
+    )
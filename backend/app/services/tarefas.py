@@ -0,0 +1,22 @@
+"""Tarefas periódicas de manutenção executadas dentro do processo da API"""
+
+import asyncio
+import logging
+from typing import Callable
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+async def repetir(nome: str, intervalo_segundos: float, tarefa: Callable[[], object]) -> None:
+    """Executa a tarefa agora e depois a cada intervalo, até ser cancelada
+
+    A tarefa (síncrona) roda no threadpool; uma falha é registrada e a
+    próxima execução acontece normalmente, sem derrubar a API.
+    """
+    while True:
+        try:
+            await run_in_threadpool(tarefa)
+        except Exception:
+            logger.exception("Falha na tarefa periódica '%s'", nome)
+        await asyncio.sleep(intervalo_segundos)
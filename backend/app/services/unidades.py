@@ -0,0 +1,53 @@
+"""Registro de unidades de medida e expressões SQL de conversão para unidades base"""
+
+from decimal import Decimal
+from typing import Tuple
+
+# unidade -> (unidade base, fator para a base). As colunas geradas a partir
+# deste registro foram criadas pela migração 004: ao alterá-lo, crie uma nova
+# migração que recrie essas colunas com as expressões novas
+UNIDADES = {
+    "mg": ("g", Decimal("0.001")),
+    "g": ("g", Decimal("1")),
+    "kg": ("g", Decimal("1000")),
+    "ml": ("ml", Decimal("1")),
+    "l": ("ml", Decimal("1000")),
+    "un": ("un", Decimal("1")),
+    "dz": ("un", Decimal("12")),
+}
+
+# Grafias alternativas aceitas nos cadastros
+ALIASES = {
+    "grama": "g",
+    "gramas": "g",
+    "quilo": "kg",
+    "kilo": "kg",
+    "litro": "l",
+    "litros": "l",
+    "lt": "l",
+    "unidade": "un",
+    "unidades": "un",
+    "und": "un",
+    "duzia": "dz",
+}
+
+
+def _casos_sql(coluna: str, valor) -> Tuple[str, str]:
+    chave = f"lower(trim({coluna}))"
+    nomes = list(UNIDADES) + list(ALIASES)
+    casos = " ".join(
+        f"WHEN '{nome}' THEN {valor(UNIDADES[ALIASES.get(nome, nome)])}" for nome in nomes
+    )
+    return chave, casos
+
+
+def fator_base_sql(coluna: str) -> str:
+    """Expressão SQL com o fator de conversão da unidade para a base"""
+    chave, casos = _casos_sql(coluna, lambda item: item[1])
+    return f"CASE {chave} {casos} ELSE 1 END"
+
+
+def unidade_base_sql(coluna: str) -> str:
+    """Expressão SQL com a unidade base (desconhecidas ficam normalizadas)"""
+    chave, casos = _casos_sql(coluna, lambda item: f"'{item[0]}'")
+    return f"CASE {chave} {casos} ELSE {chave} END"
@@ -0,0 +1,66 @@
+"""Versões em processo das coleções, usadas como ETag nas leituras"""
+
+import threading
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, Optional
+from fastapi import Depends, HTTPException, Request, Response
+
+PEDIDOS = "pedidos"
+RECEITAS = "receitas"
+ESTOQUE = "estoque"
+
+
+class VersoesColecoes:
+    """Contadores por coleção, incrementados pelas escritas após o commit"""
+
+    def __init__(self):
+        # Identifica o processo: versões de outra instância nunca coincidem
+        self._instancia = uuid.uuid4().hex[:8]
+        self._versoes: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def etag(self, *colecoes: str, variante: str = "") -> str:
+        partes = "-".join(f"{colecao}{self._versoes[colecao]}" for colecao in colecoes)
+        if variante:
+            partes = f"{partes}-{variante}"
+        return f'W/"{self._instancia}-{partes}"'
+
+    def incrementar(self, *colecoes: str) -> None:
+        with self._lock:
+            for colecao in colecoes:
+                self._versoes[colecao] += 1
+
+
+# Instância global das versões
+versoes = VersoesColecoes()
+
+
+def _sem_variante() -> str:
+    return ""
+
+
+def condicional(
+    *colecoes: str, variante: Optional[Callable[..., str]] = None
+) -> Callable[..., None]:
+    """Dependência de GET condicional: responde 304 se o ETag não mudou
+
+    variante é uma dependência cujo valor também entra no ETag, para leituras
+    que mudam sem escrita nenhuma (ex: período padrão relativo à data de hoje).
+    """
+
+    def verificar(
+        request: Request,
+        response: Response,
+        chave: str = Depends(variante or _sem_variante),
+    ) -> None:
+        etag = versoes.etag(*colecoes, variante=chave)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            candidatos = {valor.strip() for valor in if_none_match.split(",")}
+            if etag in candidatos or "*" in candidatos:
+                raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    return verificar
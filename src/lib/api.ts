@@ -149,11 +149,12 @@ class ApiClient {
   async getAgenda(params?: {
     data_inicio?: string;
     data_fim?: string;
+    incluir_itens?: boolean;
   }): Promise<any[]> {
     const queryParams = new URLSearchParams();
     if (params) {
       Object.entries(params).forEach(([key, value]) => {
-        if (value) queryParams.append(key, value);
+        if (value) queryParams.append(key, String(value));
       });
     }
     const query = queryParams.toString();